@@ -3,9 +3,20 @@ import sys
 import threading
 import time
 import webbrowser
+import sqlite3
 import il2_core
+import db
+import snapshot
+import sidecar
+import catalog
+import startup
+import photo_store
+import static_assets
+import server
+import events
+import sources
 from flask import Flask, send_from_directory
-from config import load_config, save_config, clear_config, find_il2_installation, get_config_path
+from config import load_config, save_config, clear_config, find_il2_installation, get_config_path, load_archive_databases
 
 
 # ---- PyInstaller Static Path logic ----
@@ -16,7 +27,8 @@ else:
     STATIC_ROOT = os.path.abspath("static")
     FROZEN = False
 
-app = Flask(__name__, static_folder=STATIC_ROOT)
+# /static is served by serve_static below (fingerprinted, precompressed assets)
+app = Flask(__name__, static_folder=None)
     
 CONFIG_PATH = get_config_path()
 CONFIG_DIR = os.path.dirname(CONFIG_PATH)
@@ -29,37 +41,26 @@ else:
 os.makedirs(PILOT_PHOTO_DIR, exist_ok=True)
 os.makedirs(CHARACTERSRANKS_DIR, exist_ok=True)
 
-game_path = load_config()
-DB_PATH = None
-
-if game_path:
-    print(f"Startup ensure_charactersranks: {game_path}, {CONFIG_DIR}")
-    il2_core.ensure_charactersranks(game_path, CONFIG_DIR)
-    DB_PATH = os.path.join(game_path, "data", "Career", "cp.db")
-    if not os.path.isfile(DB_PATH):
-        # If the config.json path is wrong, try auto-locating!
-        game_path, DB_PATH = find_il2_installation()
-        if DB_PATH and os.path.isfile(DB_PATH):
-            save_config(game_path)
-        else:
-            game_path = None
-            DB_PATH = None
-else:
-    game_path, DB_PATH = find_il2_installation()
-    if DB_PATH and os.path.isfile(DB_PATH):
-        save_config(game_path)
-    else:
-        game_path = None
-        DB_PATH = None
+# ---- Snapshot mode: serve reads from a copy of cp.db, not the file the game writes ----
+# Set IL2_PASSPORT_SNAPSHOT=0 to read cp.db in place.
+SNAPSHOT_MODE = os.environ.get("IL2_PASSPORT_SNAPSHOT", "1") != "0"
+if SNAPSHOT_MODE:
+    db.use_snapshots(snapshot.SnapshotStore(os.path.join(CONFIG_DIR, "snapshots")))
+# Read in place, lookups go through a sidecar index database instead (cp.db itself is never written)
+SIDECAR_DIR = os.path.join(CONFIG_DIR, "sidecars")
 
 # Make these available to blueprints
-app.config["DB_PATH"] = DB_PATH
+# DB_PATH/GAME_PATH are filled in by locate_installation() once the server is up
+app.config["DB_PATH"] = None
 app.config["STATIC_ROOT"] = STATIC_ROOT
 app.config["PILOT_PHOTO_DIR"] = PILOT_PHOTO_DIR
 app.config["FROZEN"] = FROZEN
-app.config["GAME_PATH"] = game_path
+app.config["GAME_PATH"] = None
 app.config["CONFIG_DIR"] = CONFIG_DIR
 app.config["CHARACTERSRANKS_DIR"] = CHARACTERSRANKS_DIR
+app.config["SNAPSHOT_MODE"] = SNAPSHOT_MODE
+# Extra cp.db files (old installs, backups) listed next to the game's own; see sources.py
+app.config["ARCHIVE_SOURCES"] = []
 
 # ----- Register API blueprint AFTER everything else -----
 from routes import api_bp, last_ping
@@ -74,29 +75,116 @@ if FROZEN:
 
 @app.route("/")
 def index():
-    return send_from_directory(STATIC_ROOT, 'index.html')
+    return static_assets.index_response(STATIC_ROOT, FROZEN)
 
 @app.route('/static/<path:path>')
 def serve_static(path):
-    return send_from_directory(STATIC_ROOT, path)
+    return static_assets.static_response(STATIC_ROOT, FROZEN, path)
 
-if FROZEN:
-    @app.route('/pilot_photos/<path:filename>')
-    def serve_pilot_photo(filename):
-        return send_from_directory(PILOT_PHOTO_DIR, filename)
+@app.route('/pilot_photos/<path:filename>')
+def serve_pilot_photo(filename):
+    return photo_store.photo_response(PILOT_PHOTO_DIR, filename)
+
+# ---- Startup work: runs on a background worker so the server binds at once ----
+def locate_installation():
+    game_path = load_config()
+    DB_PATH = None
+
+    if game_path:
+        DB_PATH = os.path.join(game_path, "data", "Career", "cp.db")
+        if not os.path.isfile(DB_PATH):
+            # If the config.json path is wrong, try auto-locating!
+            game_path, DB_PATH = find_il2_installation()
+            if DB_PATH and os.path.isfile(DB_PATH):
+                save_config(game_path)
+            else:
+                game_path = None
+                DB_PATH = None
+    else:
+        game_path, DB_PATH = find_il2_installation()
+        if DB_PATH and os.path.isfile(DB_PATH):
+            save_config(game_path)
+        else:
+            game_path = None
+            DB_PATH = None
+
+    app.config["GAME_PATH"] = game_path
+    app.config["DB_PATH"] = DB_PATH
+    app.config["ARCHIVE_SOURCES"] = sources.archive_sources(load_archive_databases(), DB_PATH)
+    if app.config["ARCHIVE_SOURCES"]:
+        print(f"Archive databases: {', '.join(s.path for s in app.config['ARCHIVE_SOURCES'])}")
+
+def sync_charactersranks():
+    game_path = app.config.get("GAME_PATH")
+    if game_path:
+        print(f"Startup charactersranks sync: {game_path}, {CHARACTERSRANKS_DIR}")
+        il2_core.sync_mod_charactersranks(game_path, CHARACTERSRANKS_DIR)
 
+def warm_caches():
+    catalog.get_catalog(STATIC_ROOT, CHARACTERSRANKS_DIR, CONFIG_DIR)
+    # Every database is indexed on its own pool thread
+    sources.map_sources(lambda s: sync_database(s.path, s.id), sources.configured_sources(app.config))
+
+def sync_database(db_path, source=sources.LIVE):
+    db.sync(db_path)
+    if not SNAPSHOT_MODE:
+        sidecar.refresh(db_path, SIDECAR_DIR)
+    # Tell open pages whose career data changed since the previous sync
+    events.publish_changes(db_path, source)
+
+STARTUP_STEPS = [
+    ("locating", "Looking for the IL-2 installation", locate_installation),
+    ("charactersranks", "Copying modded rank insignia", sync_charactersranks),
+    ("indexing", "Indexing career database", warm_caches),
+]
+
+# Imported by a WSGI server, __main__ never starts the worker: locate the game on the
+# first request instead (indexing then happens on demand), before any route sees DB_PATH
+@app.before_request
+def locate_on_first_request():
+    if app.config["DB_PATH"] is None:
+        startup.run_once(STARTUP_STEPS[:2])
+
+# An open /api/events stream keeps the app alive; /api/ping still does for older pages
 def ping_monitor():
     while True:
         time.sleep(5)
-        if time.time() - last_ping[0] > 60:
-            print("No activity detected for 60s. Exiting Flask app.")
-            os._exit(0)
+        idle = min(time.time() - last_ping[0], events.broker.idle_seconds())
+        if idle > 60:
+            server.shutdown("No activity detected for 60s.")
+
+# --- cp.db watcher: re-copy the snapshot and refresh the indexes as soon as the game writes ---
+DB_POLL_INTERVAL = 2
+
+def db_monitor():
+    # The startup worker does the first sync; running it twice at once would only race
+    while not startup.is_ready():
+        time.sleep(DB_POLL_INTERVAL)
+    # Per database, so a write to one never re-indexes the others
+    last_versions = {}
+    while True:
+        for source in sources.configured_sources(app.config):
+            db_path = source.path
+            try:
+                version = db.live_version(db_path)
+                if version != last_versions.get(db_path):
+                    started = time.time()
+                    sync_database(db_path, source.id)
+                    last_versions[db_path] = version
+                    print(f"{source.label} cp.db indexes refreshed in {(time.time() - started) * 1000:.0f} ms")
+            except (sqlite3.Error, OSError) as e:
+                # The game may hold a write lock for a moment; retry next round
+                print(f"{source.label} cp.db refresh failed:", e)
+        time.sleep(DB_POLL_INTERVAL)
             
 def open_browser():
     time.sleep(1)
-    webbrowser.open("http://127.0.0.1:5000/")
+    webbrowser.open(f"http://{server.HOST}:{server.PORT}/")
 
 if __name__ == "__main__":
+    startup.run_in_background(STARTUP_STEPS)
     threading.Thread(target=open_browser, daemon=True).start()
     threading.Thread(target=ping_monitor, daemon=True).start()
-    app.run(debug=False)
+    threading.Thread(target=db_monitor, daemon=True).start()
+    # Development server unless IL2_PASSPORT_SERVER=waitress (see server.py)
+    server.serve(app)
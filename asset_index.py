@@ -0,0 +1,147 @@
+import os
+import hashlib
+import threading
+from datetime import datetime
+from functools import lru_cache
+from photo_store import PHOTO_NAME_RE
+import metrics
+
+RANK_IMAGE_NAMES = ("big.png", "big.1943.png", "medium.png")
+AWARD_IMAGE_NAME = "preview.png"
+RANK_PLACEHOLDER = "/static/images/award_placeholder.png"
+AWARD_PLACEHOLDER = "/static/images/award_placeholder.png"
+PHOTO_PLACEHOLDER = "/static/images/sample_photo.jpg"
+SOVIET_1943 = datetime(1943, 1, 1)
+
+
+@lru_cache(maxsize=4096)
+def pilot_photo_hash(desc):
+    return hashlib.sha256(desc.encode("utf-8")).hexdigest()[:20]
+
+
+@lru_cache(maxsize=4096)
+def rank_image_name(country, date_str):
+    """big.png / big.1943.png / medium.png, as il2_core.get_rank_image_path picks them."""
+    if country == 101 and date_str:
+        try:
+            if datetime.strptime(date_str, "%Y.%m.%d") >= SOVIET_1943:
+                return "big.1943.png"
+        except Exception:
+            pass
+    elif country == 103:
+        return "medium.png"
+    return "big.png"
+
+
+def _scan_images(folder, names):
+    """{subfolder: {image names present}} for the given file names, one listing per subfolder."""
+    found = {}
+    if not folder or not os.path.isdir(folder):
+        return found
+    metrics.count_probe("asset_index_scan")
+    with os.scandir(folder) as entries:
+        for entry in entries:
+            if not entry.is_dir():
+                continue
+            metrics.count_probe("asset_index_scan")
+            try:
+                present = {n for n in os.listdir(entry.path) if n in names}
+            except OSError:
+                continue
+            if present:
+                found[entry.name] = present
+    return found
+
+
+class AssetIndex:
+    """Which rank, award and photo images exist, so resolving them is a dict lookup."""
+
+    def __init__(self, STATIC_ROOT, CHARACTERSRANKS_DIR, PILOT_PHOTO_DIR, frozen):
+        self.frozen = frozen
+        self.mod_ranks = _scan_images(CHARACTERSRANKS_DIR, RANK_IMAGE_NAMES)
+        self.standard_ranks = _scan_images(
+            os.path.join(STATIC_ROOT, "standard_charactersranks"), RANK_IMAGE_NAMES
+        )
+        self.awards = set(_scan_images(os.path.join(STATIC_ROOT, "achievements"), (AWARD_IMAGE_NAME,)))
+        # pilot hash -> file name; content-hashed uploads win over older plain <hash>.png ones
+        self.photos = {}
+        if PILOT_PHOTO_DIR and os.path.isdir(PILOT_PHOTO_DIR):
+            metrics.count_probe("asset_index_scan")
+            for name in sorted(os.listdir(PILOT_PHOTO_DIR), key=len):
+                match = PHOTO_NAME_RE.match(name)
+                if not match:
+                    continue
+                self.photos[match.group("pilot")] = name
+        self._rank_urls = {}
+
+    def rank_image(self, country, rank_id, date_str):
+        filename = rank_image_name(country, date_str)
+        key = (country, rank_id, filename)
+        url = self._rank_urls.get(key)
+        if url is None:
+            url = self._rank_urls[key] = self._resolve_rank(country, rank_id, filename)
+        return url
+
+    def _resolve_rank(self, country, rank_id, filename):
+        folder = str(country * 1000 + rank_id)
+        # Modded insignia first, then the bundled standard set
+        if filename in self.mod_ranks.get(folder, ()):
+            prefix = "/charactersranks" if self.frozen else "/static/charactersranks"
+            return f"{prefix}/{folder}/{filename}"
+        if filename in self.standard_ranks.get(folder, ()):
+            return f"/static/standard_charactersranks/{folder}/{filename}"
+        return RANK_PLACEHOLDER
+
+    def award_image(self, tpar2):
+        if str(tpar2) in self.awards:
+            return f"/static/achievements/{tpar2}/{AWARD_IMAGE_NAME}"
+        return AWARD_PLACEHOLDER
+
+    def photo_url(self, desc):
+        name = self.photos.get(pilot_photo_hash(desc))
+        if name is None:
+            return PHOTO_PLACEHOLDER
+        return f"/pilot_photos/{name}"
+
+
+def asset_dirs(STATIC_ROOT, CHARACTERSRANKS_DIR, PILOT_PHOTO_DIR):
+    return [
+        CHARACTERSRANKS_DIR,
+        os.path.join(STATIC_ROOT, "standard_charactersranks"),
+        os.path.join(STATIC_ROOT, "achievements"),
+        PILOT_PHOTO_DIR,
+    ]
+
+
+def _dir_mtime(path):
+    if not path:
+        return None
+    metrics.count_probe("asset_index_stat")
+    try:
+        return os.stat(path).st_mtime_ns
+    except OSError:
+        return None
+
+
+# ---- Process-wide index, invalidated by directory mtime or invalidate() ----
+_index = [None, None]  # [stamps, AssetIndex]
+_index_lock = threading.Lock()
+
+
+def get_asset_index(STATIC_ROOT, CHARACTERSRANKS_DIR, PILOT_PHOTO_DIR, frozen):
+    stamps = [frozen] + [
+        [folder, _dir_mtime(folder)]
+        for folder in asset_dirs(STATIC_ROOT, CHARACTERSRANKS_DIR, PILOT_PHOTO_DIR)
+    ]
+    with _index_lock:
+        if _index[0] == stamps:
+            return _index[1]
+        index = AssetIndex(STATIC_ROOT, CHARACTERSRANKS_DIR, PILOT_PHOTO_DIR, frozen)
+        _index[0], _index[1] = stamps, index
+        return index
+
+
+def invalidate():
+    """Forget the index; the next get_asset_index() rescans (e.g. after a photo upload)."""
+    with _index_lock:
+        _index[0] = _index[1] = None
@@ -0,0 +1,136 @@
+import os
+import json
+import time
+import shutil
+import hashlib
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+
+MANIFEST_NAME = ".sync_manifest.json"
+MANIFEST_VERSION = 1
+SYNC_WORKERS = 8
+HASH_CHUNK = 1024 * 1024
+
+SyncReport = namedtuple("SyncReport", "added updated removed unchanged seconds")
+
+
+def file_hash(path):
+    h = hashlib.sha1()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(HASH_CHUNK), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def scan_tree(root, skip=()):
+    """{relative path (with /): (size, mtime_ns)} for every file under root."""
+    files = {}
+    stack = [""]
+    while stack:
+        rel_dir = stack.pop()
+        with os.scandir(os.path.join(root, rel_dir)) as entries:
+            for entry in entries:
+                rel = f"{rel_dir}/{entry.name}" if rel_dir else entry.name
+                if entry.is_dir(follow_symlinks=False):
+                    stack.append(rel)
+                elif entry.is_file() and rel not in skip:
+                    st = entry.stat()
+                    files[rel] = (st.st_size, st.st_mtime_ns)
+    return files
+
+
+def load_manifest(dest_dir):
+    try:
+        with open(os.path.join(dest_dir, MANIFEST_NAME), "r", encoding="utf-8") as f:
+            data = json.load(f)
+    except (OSError, ValueError):
+        return {}
+    if data.get("version") != MANIFEST_VERSION:
+        return {}
+    return {rel: tuple(entry) for rel, entry in data.get("files", {}).items()}
+
+
+def save_manifest(dest_dir, files):
+    path = os.path.join(dest_dir, MANIFEST_NAME)
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump({"version": MANIFEST_VERSION, "files": files}, f, separators=(",", ":"))
+    os.replace(tmp_path, path)
+
+
+def _sync_file(src_dir, dest_dir, rel, known):
+    """Bring one file up to date; returns ("added"|"updated"|"unchanged", manifest entry)."""
+    src = os.path.join(src_dir, *rel.split("/"))
+    dest = os.path.join(dest_dir, *rel.split("/"))
+    st = os.stat(src)
+    digest = file_hash(src)
+    if os.path.isfile(dest) and os.path.getsize(dest) == st.st_size:
+        # Touched but identical, or copied by an older version without a manifest
+        if (known and known[2] == digest) or (not known and file_hash(dest) == digest):
+            return "unchanged", [st.st_size, st.st_mtime_ns, digest]
+    action = "updated" if os.path.exists(dest) else "added"
+    os.makedirs(os.path.dirname(dest), exist_ok=True)
+    tmp_path = dest + ".tmp"
+    shutil.copy2(src, tmp_path)
+    os.replace(tmp_path, dest)
+    return action, [st.st_size, st.st_mtime_ns, digest]
+
+
+def _remove_empty_dirs(root):
+    for folder, dirs, files in os.walk(root, topdown=False):
+        if folder != root and not dirs and not files:
+            try:
+                os.rmdir(folder)
+            except OSError:
+                pass
+
+
+def sync_tree(src_dir, dest_dir, workers=SYNC_WORKERS):
+    """Mirror src_dir into dest_dir, copying only files whose size, mtime or hash changed.
+
+    A file whose (size, mtime) matches the manifest is trusted without being read,
+    so an unchanged tree costs one directory walk. Files in dest_dir that are not
+    in src_dir are removed.
+    """
+    started = time.time()
+    os.makedirs(dest_dir, exist_ok=True)
+    manifest = load_manifest(dest_dir)
+    source = scan_tree(src_dir)
+    existing = scan_tree(dest_dir, skip={MANIFEST_NAME})
+
+    files = {}
+    pending = []
+    for rel, (size, mtime_ns) in source.items():
+        known = manifest.get(rel)
+        if known and known[0] == size and known[1] == mtime_ns and existing.get(rel, (None,))[0] == size:
+            files[rel] = list(known)
+        else:
+            pending.append((rel, known))
+
+    added, updated, unchanged = [], [], len(files)
+    if pending:
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            results = pool.map(lambda job: _sync_file(src_dir, dest_dir, *job), pending)
+            for (rel, _), (action, entry) in zip(pending, results):
+                files[rel] = entry
+                if action == "added":
+                    added.append(rel)
+                elif action == "updated":
+                    updated.append(rel)
+                else:
+                    unchanged += 1
+
+    removed = sorted(rel for rel in existing if rel not in source)
+    for rel in removed:
+        try:
+            os.remove(os.path.join(dest_dir, *rel.split("/")))
+        except OSError:
+            pass
+    if removed:
+        _remove_empty_dirs(dest_dir)
+
+    # Rewriting the manifest also bumps dest_dir's mtime, which is what
+    # catalog.get_catalog watches for changes
+    if added or updated or removed or files != {rel: list(e) for rel, e in manifest.items()}:
+        save_manifest(dest_dir, files)
+    return SyncReport(sorted(added), sorted(updated), removed, unchanged, time.time() - started)
@@ -0,0 +1,4 @@
+"""Benchmarks for il2_core and the API against synthetic cp.db files.
+
+    python -m benchmark --pilots 200 --chain-length 12 --sorties 150 --output results.json
+"""
@@ -0,0 +1,230 @@
+import os
+import sys
+import json
+import time
+import random
+import shutil
+import sqlite3
+import argparse
+import platform
+import tempfile
+import statistics
+import contextlib
+from urllib.request import pathname2url
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if REPO_ROOT not in sys.path:
+    sys.path.insert(0, REPO_ROOT)
+
+from benchmark import synthetic_db  # noqa: E402
+
+# (name, path, extra query args) timed for every sampled pilot
+PILOT_ENDPOINTS = [
+    ("service_record", "/api/service_record", {}),
+    ("pilot_stats", "/api/pilot_stats", {}),
+    ("pilot_sorties", "/api/pilot_sorties", {}),
+    ("pilot_sorties_page", "/api/pilot_sorties", {"limit": "50"}),
+    ("pilot_sortie_summary", "/api/pilot_sortie_summary", {}),
+    ("pilot_dossier", "/api/pilot_dossier", {"limit": "50"}),
+]
+
+
+def summarize(samples):
+    """Milliseconds: count, min, median, mean, p95 and max of a list of seconds."""
+    ms = sorted(s * 1000 for s in samples)
+    if not ms:
+        return {"n": 0}
+    return {
+        "n": len(ms),
+        "min_ms": round(ms[0], 3),
+        "median_ms": round(statistics.median(ms), 3),
+        "mean_ms": round(statistics.fmean(ms), 3),
+        "p95_ms": round(ms[min(len(ms) - 1, int(len(ms) * 0.95))], 3),
+        "max_ms": round(ms[-1], 3),
+    }
+
+
+def time_calls(fn, inputs, repeat, before=None):
+    """Time fn(*args) once per input, repeat times over; before() runs untimed first."""
+    samples = []
+    for _ in range(repeat):
+        for args in inputs:
+            if before is not None:
+                before()
+            started = time.perf_counter()
+            fn(*args)
+            samples.append(time.perf_counter() - started)
+    return summarize(samples)
+
+
+def open_readonly(db_path):
+    return sqlite3.connect("file:" + pathname2url(os.path.abspath(db_path)) + "?mode=ro", uri=True)
+
+
+# ---- il2_core and the name resolvers, straight against the database ----
+def bench_core(db_path, static_root, repeat, sample, rng):
+    import il2_core
+    import catalog
+    from career_graph import build_career_graph
+
+    results = {}
+    conn = open_readonly(db_path)
+    try:
+        graph = build_career_graph(conn)
+        career_ids = rng.sample(list(graph.parent), min(sample, len(graph.parent)))
+        chains = [graph.chain(cid) for cid in career_ids]
+        results["build_career_graph"] = time_calls(build_career_graph, [(conn,)], repeat)
+        results["collect_career_chain"] = time_calls(
+            il2_core.collect_career_chain, [(conn, cid) for cid in career_ids], repeat)
+        results["find_chain_tip"] = time_calls(
+            il2_core.find_chain_tip, [(conn, chain) for chain in chains], repeat)
+
+        descs = [row[0] for row in conn.execute(
+            "SELECT DISTINCT description FROM pilot ORDER BY id LIMIT ?", (sample,))]
+        results["get_latest_pilot"] = time_calls(
+            il2_core.get_latest_pilot, [(conn, desc) for desc in descs], repeat)
+
+        ranks = conn.execute(
+            "SELECT DISTINCT rankId FROM event WHERE type = 6 LIMIT ?", (sample,)).fetchall()
+        rank_args = [(country, rank_id) for country in synthetic_db.COUNTRIES for (rank_id,) in ranks]
+        awards = [row[0] for row in conn.execute(
+            "SELECT DISTINCT tpar2 FROM event WHERE type = 8 LIMIT ?", (sample,))]
+        squadrons = [row[0] for row in conn.execute("SELECT id FROM squadron LIMIT ?", (sample,))]
+
+        # The per-lookup file probes the roster used to make...
+        results["get_rank_name"] = time_calls(
+            lambda c, r: il2_core.get_rank_name(c, r, static_root), rank_args, repeat)
+        results["get_award_name_static"] = time_calls(
+            lambda t: il2_core.get_award_name_static(t, static_root), [(t,) for t in awards], repeat)
+        results["get_squadron_shortname"] = time_calls(
+            lambda s: il2_core.get_squadron_shortname(s, conn, static_root),
+            [(s,) for s in squadrons], repeat)
+
+        # ...and the catalog lookups that replaced them
+        started = time.perf_counter()
+        names = catalog.get_catalog(static_root)
+        results["get_catalog_cold"] = summarize([time.perf_counter() - started])
+        results["catalog.rank_name"] = time_calls(names.rank_name, rank_args, repeat)
+        results["catalog.award_name"] = time_calls(names.award_name, [(t,) for t in awards], repeat)
+        config_ids = [row[0] for row in conn.execute("SELECT configId FROM squadron")]
+        results["catalog.squadron_name"] = time_calls(
+            names.squadron_name, [(c,) for c in config_ids], repeat)
+    finally:
+        conn.close()
+    return results
+
+
+# ---- The API, through the Flask test client ----
+def _request(client, path, args):
+    response = client.get(path, query_string=args)
+    body = response.get_data()
+    if response.status_code != 200:
+        raise RuntimeError(f"{path} {args}: HTTP {response.status_code} {body[:200]!r}")
+    return body
+
+
+def bench_endpoints(db_path, repeat, sample, rng):
+    import app as app_module
+    from response_cache import response_cache
+
+    flask_app = app_module.app
+    flask_app.config["DB_PATH"] = db_path
+    client = flask_app.test_client()
+    results = {}
+
+    # What the startup "indexing" step does: snapshot, career graph, pilot index, sidecar
+    started = time.perf_counter()
+    with flask_app.app_context():
+        app_module.sync_database(db_path)
+    results["startup_sync"] = summarize([time.perf_counter() - started])
+
+    started = time.perf_counter()
+    pilots = json.loads(_request(client, "/api/pilots", {}))
+    results["pilots_first"] = summarize([time.perf_counter() - started])
+    results["pilots"] = time_calls(_request, [(client, "/api/pilots", {})], repeat,
+                                   before=response_cache.clear)
+    results["pilots_cached"] = time_calls(_request, [(client, "/api/pilots", {})], repeat)
+
+    descs = [p["desc"] for p in rng.sample(pilots, min(sample, len(pilots)))]
+    for name, path, extra in PILOT_ENDPOINTS:
+        inputs = [(client, path, dict(extra, desc=desc)) for desc in descs]
+        results[name] = time_calls(_request, inputs, repeat, before=response_cache.clear)
+        results[name + "_cached"] = time_calls(_request, inputs, repeat)
+        results[name]["bytes"] = sum(len(_request(*args)) for args in inputs) // max(len(inputs), 1)
+
+    return results, len(pilots)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog="python -m benchmark",
+        description="Time il2_core and the API against a synthetic or real cp.db.")
+    parser.add_argument("--db", help="benchmark an existing cp.db instead of a synthetic one")
+    parser.add_argument("--pilots", type=int, default=50, help="career chains to generate")
+    parser.add_argument("--chain-length", type=int, default=8, help="careers per chain")
+    parser.add_argument("--sorties", type=int, default=100, help="sorties per career")
+    parser.add_argument("--events", type=int, default=12, help="events per career")
+    parser.add_argument("--repeat", type=int, default=5, help="timed runs per input")
+    parser.add_argument("--sample", type=int, default=10, help="pilots/careers timed per benchmark")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--in-place", action="store_true",
+                        help="read cp.db in place (sidecar) instead of from a snapshot")
+    parser.add_argument("--workdir", help="where the database and app config go (default: a temp dir)")
+    parser.add_argument("--keep", action="store_true", help="keep the work directory")
+    parser.add_argument("--output", help="write the JSON report here instead of stdout")
+    args = parser.parse_args(argv)
+
+    workdir = args.workdir or tempfile.mkdtemp(prefix="il2-benchmark-")
+    os.makedirs(workdir, exist_ok=True)
+    # The app keeps its config, snapshots and sidecars under LOCALAPPDATA and
+    # finds static/ relative to the working directory; both are set before it is imported
+    os.environ["LOCALAPPDATA"] = workdir
+    os.environ["IL2_PASSPORT_SNAPSHOT"] = "0" if args.in_place else "1"
+    os.chdir(REPO_ROOT)
+    static_root = os.path.join(REPO_ROOT, "static")
+    rng = random.Random(args.seed)
+
+    report = {
+        "environment": {
+            "python": platform.python_version(),
+            "sqlite": sqlite3.sqlite_version,
+            "platform": platform.platform(),
+            "mode": "in-place" if args.in_place else "snapshot",
+        },
+    }
+    try:
+        # The app logs to stdout; keep it clear for the report
+        with contextlib.redirect_stdout(sys.stderr):
+            if args.db:
+                db_path = os.path.abspath(args.db)
+                report["database"] = {"path": db_path}
+            else:
+                db_path = os.path.join(workdir, "cp.db")
+                params = {"pilots": args.pilots, "chain_length": args.chain_length,
+                          "sorties_per_career": args.sorties, "events_per_career": args.events,
+                          "seed": args.seed}
+                started = time.perf_counter()
+                counts = synthetic_db.generate(db_path, **params)
+                report["database"] = {"synthetic": params, "rows": counts,
+                                      "generate_seconds": round(time.perf_counter() - started, 3)}
+            report["database"]["bytes"] = os.path.getsize(db_path)
+
+            print(f"Benchmarking il2_core on {db_path}")
+            report["core"] = bench_core(db_path, static_root, args.repeat, args.sample, rng)
+            print("Benchmarking endpoints")
+            report["endpoints"], report["database"]["roster"] = bench_endpoints(
+                db_path, args.repeat, args.sample, rng)
+    finally:
+        if not args.keep and not args.workdir:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+
+
+if __name__ == "__main__":
+    main()
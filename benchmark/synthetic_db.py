@@ -0,0 +1,140 @@
+import os
+import random
+import sqlite3
+from datetime import date, timedelta
+import sortie_buckets
+
+# Every kill column the logbook buckets know about, in pilot and sortie alike
+KILL_COLUMNS = [c for columns in sortie_buckets.KILL_BUCKETS.values() for c in columns]
+PILOT_STAT_COLUMNS = ["flightTime", "sorties", "goodSorties", "killStaticPlane", "killPilot",
+                      "killInfantry", "killAssist"] + KILL_COLUMNS
+
+COUNTRIES = (101, 102, 103, 201)
+RANK_IDS = range(0, 5)
+SQUADRON_CONFIG_IDS = (101001, 101003, 102001, 103001, 201001, 201002)
+AWARD_IDS = tuple(range(1, 40))
+MODELS = (
+    "luascripts/worldobjects/planes/yak1s69.txt",
+    "luascripts/worldobjects/planes/il2m42.txt",
+    "luascripts/worldobjects/planes/bf109f4.txt",
+    "luascripts/worldobjects/planes/fw190a5.txt",
+    "luascripts/worldobjects/planes/spitfiremkixe.txt",
+    "luascripts/worldobjects/planes/p47d28.txt",
+)
+MISSION_TEMPLATES = ("free_hunt@fighter", "ground_attack_p01", "escort-bombers@cover",
+                     "recon_p02", "intercept@defence", "bombing_p03")
+
+# event.type values: 6 promotion, 8 award; the rest is noise the queries must skip
+PROMOTION, AWARD = 6, 8
+OTHER_EVENT_TYPES = (1, 2, 3, 10, 14)
+
+SCHEMA = f"""
+CREATE TABLE career (id INTEGER PRIMARY KEY, extends INTEGER, playerId INTEGER);
+CREATE TABLE pilot (
+    id INTEGER PRIMARY KEY, description TEXT, name TEXT, lastName TEXT,
+    squadronId INTEGER, rankId INTEGER, insDate TEXT, isDeleted INTEGER,
+    {", ".join(f"{c} INTEGER" for c in PILOT_STAT_COLUMNS)}
+);
+CREATE TABLE event (
+    id INTEGER PRIMARY KEY, pilotId INTEGER, type INTEGER, date TEXT,
+    rankId INTEGER, tpar2 TEXT, squadronId INTEGER, insDate TEXT
+);
+CREATE TABLE sortie (
+    id INTEGER PRIMARY KEY, pilotId INTEGER, date TEXT, model TEXT, missionId INTEGER,
+    flightTime INTEGER, {", ".join(f"{c} INTEGER" for c in KILL_COLUMNS)}
+);
+CREATE TABLE mission (id INTEGER PRIMARY KEY, mTemplate TEXT);
+CREATE TABLE squadron (id INTEGER PRIMARY KEY, configId INTEGER);
+"""
+
+START_DATE = date(1941, 6, 22)
+
+
+def _day(offset):
+    return (START_DATE + timedelta(days=offset)).strftime("%Y.%m.%d")
+
+
+def pilot_description(n, country, rng):
+    birth = date(1915, 1, 1) + timedelta(days=rng.randrange(3650))
+    return (f"fullname=Pilot%20{n:05d}%20Synthetic&birthCountryInfo={country}"
+            f"&birthDate={birth.strftime('%Y.%m.%d')}")
+
+
+def generate(path, pilots=50, chain_length=8, sorties_per_career=100, events_per_career=12,
+             missions=500, seed=1):
+    """Write a cp.db lookalike to path and return its row counts.
+
+    Each of the ``pilots`` chains is ``chain_length`` careers long, each career
+    extending the previous one; career ids of different chains interleave, as
+    they do when several careers are played side by side.
+    """
+    rng = random.Random(seed)
+    if os.path.exists(path):
+        os.remove(path)
+    conn = sqlite3.connect(path)
+    try:
+        conn.execute("PRAGMA journal_mode = OFF")
+        conn.execute("PRAGMA synchronous = OFF")
+        conn.executescript(SCHEMA)
+
+        squadrons = list(enumerate(SQUADRON_CONFIG_IDS, start=1))
+        conn.executemany("INSERT INTO squadron VALUES (?, ?)", squadrons)
+        conn.executemany(
+            "INSERT INTO mission VALUES (?, ?)",
+            ((m, f"{rng.choice(MISSION_TEMPLATES)}_{m}") for m in range(1, missions + 1))
+        )
+
+        chains = []
+        for n in range(pilots):
+            country = rng.choice(COUNTRIES)
+            home = [sid for sid, config_id in squadrons if config_id // 1000 == country]
+            chains.append((pilot_description(n, country, rng), home or [squadrons[0][0]]))
+
+        stat_cols = ", ".join(PILOT_STAT_COLUMNS)
+        pilot_sql = (f"INSERT INTO pilot (id, description, name, lastName, squadronId, rankId, "
+                     f"insDate, isDeleted, {stat_cols}) VALUES "
+                     f"({', '.join('?' * (8 + len(PILOT_STAT_COLUMNS)))})")
+        sortie_sql = (f"INSERT INTO sortie (pilotId, date, model, missionId, flightTime, "
+                      f"{', '.join(KILL_COLUMNS)}) VALUES "
+                      f"({', '.join('?' * (5 + len(KILL_COLUMNS)))})")
+        event_sql = ("INSERT INTO event (pilotId, type, date, rankId, tpar2, squadronId, insDate) "
+                     "VALUES (?, ?, ?, ?, ?, ?, ?)")
+
+        last_career = {}
+        career_id = 0
+        days_per_career = 30
+        for step in range(chain_length):
+            for n, (desc, home) in enumerate(chains):
+                career_id += 1
+                pilot_id = career_id
+                squadron_id = rng.choice(home)
+                rank_id = min(step, max(RANK_IDS))
+                first_day = step * days_per_career
+                conn.execute("INSERT INTO career VALUES (?, ?, ?)",
+                             (career_id, last_career.get(n, -1), pilot_id))
+                last_career[n] = career_id
+                conn.execute(pilot_sql, [
+                    pilot_id, desc, f"Pilot {n:05d}", "Synthetic", squadron_id, rank_id,
+                    _day(first_day), 0,
+                ] + [rng.randrange(0, 50) for _ in PILOT_STAT_COLUMNS])
+
+                conn.executemany(event_sql, (
+                    (pilot_id, etype, f"{_day(first_day + e % days_per_career)} 10:00:00",
+                     rank_id, str(rng.choice(AWARD_IDS)) if etype == AWARD else "",
+                     squadron_id, _day(first_day))
+                    for e, etype in enumerate(
+                        rng.choice((PROMOTION, AWARD) + OTHER_EVENT_TYPES)
+                        for _ in range(events_per_career)
+                    )
+                ))
+                conn.executemany(sortie_sql, (
+                    [pilot_id, _day(first_day + s * days_per_career // max(sorties_per_career, 1)),
+                     rng.choice(MODELS), rng.randint(1, missions), rng.randint(600, 7200)]
+                    + [rng.choice((0, 0, 0, 1, 2)) for _ in KILL_COLUMNS]
+                    for s in range(sorties_per_career)
+                ))
+        conn.commit()
+        return {table: conn.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+                for table in ("career", "pilot", "event", "sortie", "mission", "squadron")}
+    finally:
+        conn.close()
@@ -0,0 +1,108 @@
+import db
+
+
+class CareerGraph:
+    """In-memory view of the career table: parent/child links, chains and tips.
+
+    A chain is every career reachable from a root (extends = -1) by following
+    the ``extends`` links downwards, which is what collect_career_chain used
+    to rebuild with repeated full-table scans.
+    """
+
+    def __init__(self, rows, watermark=None):
+        self.rows = rows
+        self.watermark = watermark
+        self.parent = {}
+        self.children = {}
+        self.player_of = {}
+        self.career_of_player = {}
+        for career_id, extends, player_id in rows:
+            self.parent[career_id] = extends
+            self.player_of[career_id] = player_id
+            self.career_of_player.setdefault(player_id, career_id)
+            if extends != -1:
+                self.children.setdefault(extends, []).append(career_id)
+
+        self.roots = [cid for cid, ext in self.parent.items() if ext == -1]
+        self._chains = []
+        self._chain_of = {}
+        self._tips = []
+
+        # Careers extending something that is not in the table (or caught in a
+        # cycle) still get a chain of their own instead of being dropped.
+        orphans = [cid for cid, ext in self.parent.items()
+                   if ext != -1 and ext not in self.parent]
+        for start in self.roots + orphans + list(self.parent):
+            if start not in self._chain_of:
+                self._add_chain(start)
+
+    def _add_chain(self, start):
+        index = len(self._chains)
+        chain = [start]
+        self._chain_of[start] = index
+        i = 0
+        while i < len(chain):
+            for child in self.children.get(chain[i], ()):
+                if child not in self._chain_of:
+                    self._chain_of[child] = index
+                    chain.append(child)
+            i += 1
+        leaves = [cid for cid in chain if cid not in self.children]
+        self._chains.append(chain)
+        # Normally only one, but if not, pick the highest (latest)
+        self._tips.append(max(leaves) if leaves else chain[0])
+
+    def chain(self, career_id):
+        """All career ids sharing a chain with career_id, root first."""
+        index = self._chain_of.get(career_id)
+        if index is None:
+            return [career_id]
+        return list(self._chains[index])
+
+    def tip_of(self, career_id):
+        """The latest career of the chain containing career_id."""
+        index = self._chain_of.get(career_id)
+        if index is None:
+            return career_id
+        return self._tips[index]
+
+    def tip(self, chain_ids):
+        """Same contract as il2_core.find_chain_tip, without the table scan."""
+        tips = [cid for cid in chain_ids if cid not in self.children]
+        return max(tips) if tips else chain_ids[0]
+
+    def chain_player_ids(self, chain_ids):
+        return [self.player_of[cid] for cid in chain_ids if cid in self.player_of]
+
+
+CAREER_COLUMNS = "id, extends, playerId"
+
+
+def build_career_graph(conn):
+    rows, watermark = db.read_rows(conn, "career", CAREER_COLUMNS)
+    return CareerGraph(rows, watermark)
+
+
+def refresh_career_graph(graph, conn, db_path):
+    """graph plus the careers added since it was built; None if careers were deleted."""
+    appended = db.appended_rows(conn, "career", CAREER_COLUMNS, graph.watermark)
+    if appended is None:
+        return None
+    rows, watermark = appended
+    if not rows:
+        return graph
+    return CareerGraph(graph.rows + rows, watermark)
+
+
+# ---- Per-database cache, rebuilt only when cp.db changes ----
+_graphs = db.VersionedCache(
+    lambda conn, db_path: build_career_graph(conn), refresh_career_graph, name="career_graph"
+)
+
+
+def get_career_graph(conn, db_path):
+    return _graphs.get(conn, db_path)
+
+
+def clear_career_graphs():
+    _graphs.clear()
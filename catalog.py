@@ -0,0 +1,189 @@
+import os
+import re
+import json
+import threading
+from sys import intern
+import il2_core
+import metrics
+
+SNAPSHOT_NAME = "catalog_snapshot.json"
+SNAPSHOT_VERSION = 2
+DEFAULT_LOCALE = "eng"
+INFO_FILE_RE = re.compile(r"^info\.locale=(\w+)\.txt$")
+
+
+class Catalog:
+    """Display names for squadrons, awards and ranks in every shipped locale.
+
+    Each table maps a folder id to a tuple with one name per entry of
+    ``locales`` (None where that locale has no file). The names themselves
+    live once in ``strings``, so a name shared by several locales - or by
+    several squadrons - is a single object.
+    """
+
+    def __init__(self, locales, strings, tables):
+        self.locales = locales
+        self.strings = strings
+        self.squadrons = tables.get("squadrons", {})
+        self.awards = tables.get("awards", {})
+        self.ranks = tables.get("ranks", {})
+        self.mod_ranks = tables.get("mod_ranks", {})
+        self._locale_index = {locale: i for i, locale in enumerate(locales)}
+        self._default_index = self._locale_index.get(DEFAULT_LOCALE)
+
+    def resolve_locale(self, locale):
+        return locale if locale in self._locale_index else DEFAULT_LOCALE
+
+    def _lookup(self, table, key, locale):
+        row = table.get(key)
+        if row is None:
+            return None
+        index = self._locale_index.get(locale, self._default_index)
+        name = row[index] if index is not None else None
+        if name is None and self._default_index is not None:
+            name = row[self._default_index]
+        return name
+
+    def squadron_name(self, config_id, locale=DEFAULT_LOCALE):
+        return self._lookup(self.squadrons, str(config_id), locale) or "Unknown"
+
+    def award_name(self, tpar2, locale=DEFAULT_LOCALE):
+        return self._lookup(self.awards, str(tpar2), locale) or tpar2
+
+    def rank_name(self, country, rank_id, locale=DEFAULT_LOCALE):
+        folder = str(country * 1000 + rank_id)
+        name = (self._lookup(self.mod_ranks, folder, locale)
+                or self._lookup(self.ranks, folder, locale))
+        return name if name else f"Rank {rank_id}"
+
+
+def catalog_sources(STATIC_ROOT, CHARACTERSRANKS_DIR=None):
+    """The directories a catalog is built from."""
+    return [
+        ("squadrons", os.path.join(STATIC_ROOT, "squadrons")),
+        ("awards", os.path.join(STATIC_ROOT, "achievements")),
+        ("ranks", os.path.join(STATIC_ROOT, "standard_charactersranks")),
+        ("mod_ranks", CHARACTERSRANKS_DIR),
+    ]
+
+
+def _dir_mtime(path):
+    if not path:
+        return None
+    metrics.count_probe("catalog_stat")
+    try:
+        return os.stat(path).st_mtime_ns
+    except OSError:
+        return None
+
+
+def _scan_names(folder, reader):
+    """{folder id: {locale: name}} for every info.locale=*.txt below folder."""
+    names = {}
+    if not folder or not os.path.isdir(folder):
+        return names
+    metrics.count_probe("catalog_scan")
+    for entry in os.scandir(folder):
+        if not entry.is_dir():
+            continue
+        by_locale = {}
+        metrics.count_probe("catalog_scan")
+        for info in os.scandir(entry.path):
+            match = INFO_FILE_RE.match(info.name)
+            if not match:
+                continue
+            try:
+                name = reader(info.path)
+            except OSError:
+                continue
+            if name:
+                by_locale[match.group(1)] = name
+        if by_locale:
+            names[entry.name] = by_locale
+    return names
+
+
+def scan_catalog(sources):
+    """Parse every info file in one pass into (locales, strings, tables)."""
+    scanned = {}
+    for kind, folder in sources:
+        reader = il2_core.read_squadron_shortname if kind == "squadrons" else il2_core.read_info_name
+        scanned[kind] = _scan_names(folder, reader)
+
+    locales = sorted({locale for names in scanned.values()
+                      for by_locale in names.values() for locale in by_locale})
+    strings, string_ids = [], {}
+    tables = {}
+    for kind, names in scanned.items():
+        table = {}
+        for key, by_locale in names.items():
+            row = []
+            for locale in locales:
+                name = by_locale.get(locale)
+                if name is None:
+                    row.append(-1)
+                    continue
+                if name not in string_ids:
+                    string_ids[name] = len(strings)
+                    strings.append(name)
+                row.append(string_ids[name])
+            table[key] = row
+        tables[kind] = table
+    return locales, strings, tables
+
+
+def _materialize(locales, strings, tables):
+    strings = [intern(s) for s in strings]
+    rows = {}
+    for kind, table in tables.items():
+        rows[kind] = {
+            key: tuple(strings[i] if i >= 0 else None for i in row)
+            for key, row in table.items()
+        }
+    return Catalog(locales, strings, rows)
+
+
+# ---- Snapshot persistence ----
+def _load_snapshot(snapshot_path, stamps):
+    try:
+        with open(snapshot_path, encoding="utf-8") as f:
+            data = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if data.get("version") != SNAPSHOT_VERSION or data.get("sources") != stamps:
+        return None
+    return data["locales"], data["strings"], data["tables"]
+
+
+def _save_snapshot(snapshot_path, stamps, locales, strings, tables):
+    tmp_path = snapshot_path + ".tmp"
+    try:
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"version": SNAPSHOT_VERSION, "sources": stamps, "locales": locales,
+                       "strings": strings, "tables": tables},
+                      f, ensure_ascii=False, separators=(",", ":"))
+        os.replace(tmp_path, snapshot_path)
+    except OSError as e:
+        print(f"WARNING: Could not write catalog snapshot: {e}")
+
+
+# ---- Process-wide catalog, invalidated by directory mtime ----
+_catalog = [None, None]  # [stamps, Catalog]
+_catalog_lock = threading.Lock()
+
+
+def get_catalog(STATIC_ROOT, CHARACTERSRANKS_DIR=None, CONFIG_DIR=None):
+    sources = catalog_sources(STATIC_ROOT, CHARACTERSRANKS_DIR)
+    stamps = [[kind, folder, _dir_mtime(folder)] for kind, folder in sources]
+    with _catalog_lock:
+        if _catalog[0] == stamps:
+            return _catalog[1]
+        snapshot_path = os.path.join(CONFIG_DIR, SNAPSHOT_NAME) if CONFIG_DIR else None
+        loaded = _load_snapshot(snapshot_path, stamps) if snapshot_path else None
+        if loaded is None:
+            loaded = scan_catalog(sources)
+            if snapshot_path:
+                _save_snapshot(snapshot_path, stamps, *loaded)
+        catalog = _materialize(*loaded)
+        _catalog[0], _catalog[1] = stamps, catalog
+        return catalog
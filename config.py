@@ -8,26 +8,51 @@ def get_config_path():
     os.makedirs(folder, exist_ok=True)
     return os.path.join(folder, "config.json")
 
-def load_config():
+def _read_config():
     config_path = get_config_path()
     if os.path.isfile(config_path):
-        with open(config_path, "r", encoding="utf-8") as f:
-            data = json.load(f)
-            return data.get("game_path", "")
-    return ""
+        try:
+            with open(config_path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except ValueError:
+            return {}
+        return data if isinstance(data, dict) else {}
+    return {}
 
-def save_config(game_path):
+def _write_config(data):
     config_path = get_config_path()
     with open(config_path, "w", encoding="utf-8") as f:
-        json.dump({"game_path": game_path}, f)
+        json.dump(data, f)
+
+def load_config():
+    return _read_config().get("game_path", "")
+
+def save_config(game_path):
+    # Other settings (archive_databases) are kept
+    data = _read_config()
+    data["game_path"] = game_path
+    _write_config(data)
 
 def clear_config():
-    config_path = get_config_path()
+    """Forget the game path; other settings stay."""
+    data = _read_config()
+    data.pop("game_path", None)
     try:
-        os.remove(config_path)
+        if data:
+            _write_config(data)
+        else:
+            os.remove(get_config_path())
     except Exception:
         pass
 
+def load_archive_databases():
+    """Extra cp.db files to show next to the game's: "archive_databases" in config.json
+    (paths, or {"path": ..., "label": ...}) plus IL2_PASSPORT_ARCHIVES (os.pathsep-separated)."""
+    entries = list(_read_config().get("archive_databases", []))
+    env = os.environ.get("IL2_PASSPORT_ARCHIVES", "")
+    entries += [path for path in env.split(os.pathsep) if path.strip()]
+    return entries
+
 
 def find_il2_installation():
     """Attempt to locate the IL-2 installation directory and database."""
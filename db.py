@@ -0,0 +1,333 @@
+import os
+import sqlite3
+import threading
+from collections import namedtuple
+from urllib.request import pathname2url
+from flask import g, has_request_context
+import il2_core
+import metrics
+
+MAX_IDLE_CONNECTIONS = 4
+MMAP_SIZE = 256 * 1024 * 1024
+CACHE_SIZE_KIB = 16 * 1024
+
+
+def open_readonly(db_path, immutable=False):
+    """Open cp.db read-only, so we never take a write lock the game could trip over.
+
+    immutable skips SQLite's file locking altogether; only for files nothing writes to.
+    """
+    uri = "file:" + pathname2url(os.path.abspath(db_path)) + "?mode=ro"
+    if immutable:
+        uri += "&immutable=1"
+    # CountingConnection tallies statements and rows for /api/metrics
+    conn = sqlite3.connect(uri, uri=True, check_same_thread=False,
+                           factory=metrics.CountingConnection)
+    conn.execute("PRAGMA query_only = ON")
+    conn.execute(f"PRAGMA mmap_size = {MMAP_SIZE}")
+    conn.execute(f"PRAGMA cache_size = -{CACHE_SIZE_KIB}")
+    return conn
+
+
+class PoolClosed(sqlite3.ProgrammingError):
+    """The pool was closed, e.g. because a newer snapshot replaced its file."""
+
+
+class ConnectionPool:
+    """Idle read-only connections to one database, handed out one request at a time.
+
+    The dev server runs every request on a fresh thread, so connections are
+    checked out for the duration of a request instead of being pinned to a
+    thread; a connection is only ever used by one thread at a time.
+    """
+
+    def __init__(self, db_path, max_idle=MAX_IDLE_CONNECTIONS, immutable=False):
+        self.db_path = db_path
+        self.max_idle = max_idle
+        self.immutable = immutable
+        self._idle = []
+        self._lock = threading.Lock()
+        self._closed = False
+
+    def acquire(self):
+        # Connections are opened under the lock: once close() returns none is
+        # opened any more, so the file can be deleted behind it
+        with self._lock:
+            if self._closed:
+                raise PoolClosed(f"Connection pool for {self.db_path} is closed")
+            if self._idle:
+                return self._idle.pop()
+            return open_readonly(self.db_path, self.immutable)
+
+    def release(self, conn):
+        with self._lock:
+            if not self._closed and len(self._idle) < self.max_idle:
+                self._idle.append(conn)
+                return
+        conn.close()
+
+    def close(self):
+        with self._lock:
+            self._closed = True
+            idle, self._idle = self._idle, []
+        for conn in idle:
+            conn.close()
+
+
+_pools = {}
+_pools_lock = threading.Lock()
+# Snapshot files replaced by a newer generation; no pool is ever opened on them again
+_retired = set()
+
+
+def get_pool(db_path, immutable=False):
+    with _pools_lock:
+        if db_path in _retired:
+            raise PoolClosed(f"{db_path} has been replaced by a newer snapshot")
+        pool = _pools.get(db_path)
+        if pool is None:
+            pool = _pools[db_path] = ConnectionPool(db_path, immutable=immutable)
+        return pool
+
+
+def close_pool(db_path, retire=False):
+    """Close every idle connection to db_path (and its snapshot); busy ones close when released.
+
+    retire is for snapshot files about to be deleted: no new pool is opened on them.
+    """
+    if _snapshots is not None and not retire:
+        # A source database: drop its snapshot too (a retired file is a snapshot itself)
+        _snapshots.discard(db_path)
+    with _pools_lock:
+        pool = _pools.pop(db_path, None)
+        probe = _probes.pop(db_path, None)
+        if retire:
+            _retired.add(db_path)
+    if pool:
+        pool.close()
+    if probe:
+        with probe[0]:
+            probe[1].close()
+
+
+def close_all_pools():
+    with _pools_lock:
+        paths = list(_pools) + [path for path in _probes if path not in _pools]
+    for path in paths:
+        close_pool(path)
+
+
+# ---- Change detection ----
+# PRAGMA data_version is only comparable between calls on the same connection,
+# so each database gets one long-lived probe connection for it.
+_probes = {}
+
+
+def live_version(db_path):
+    """A token that changes whenever cp.db is written, by file stat or by SQLite itself."""
+    signature = il2_core.db_signature(db_path)
+    with _pools_lock:
+        probe = _probes.get(db_path)
+        if probe is None:
+            probe = _probes[db_path] = (threading.Lock(), open_readonly(db_path))
+    with probe[0]:
+        data_version = probe[1].execute("PRAGMA data_version").fetchone()[0]
+    return signature, data_version
+
+
+# ---- Snapshot mode ----
+# With a snapshot.SnapshotStore installed, reads of cp.db are served from a
+# copy in the config directory and only the watcher ever touches the original.
+_snapshots = None
+
+
+def use_snapshots(store):
+    global _snapshots
+    _snapshots = store
+
+
+def resolve_source(db_path):
+    """(file to read, version of its contents) for cp.db at db_path."""
+    if _snapshots is None:
+        return db_path, live_version(db_path)
+    snapshot = _snapshots.current(db_path)
+    return snapshot.path, snapshot.version
+
+
+# What one checkout reads: the file, the version of its contents and a
+# connection to it taken from pool
+Checkout = namedtuple("Checkout", "path version pool conn")
+CHECKOUT_ATTEMPTS = 5
+
+
+def checkout(db_path):
+    """Choose the file to read for db_path and check a connection out of it in one go.
+
+    The open connection keeps the file readable even if the watcher swaps in
+    a newer snapshot right after; when that happens before the connection is
+    taken, the old pool is closed and the new snapshot is used instead.
+    """
+    for attempt in range(CHECKOUT_ATTEMPTS):
+        read_path, version = resolve_source(db_path)
+        try:
+            pool = get_pool(read_path, immutable=read_path != db_path)
+            return Checkout(read_path, version, pool, pool.acquire())
+        except PoolClosed:
+            if attempt == CHECKOUT_ATTEMPTS - 1:
+                raise
+
+
+# with_connection() pins its checkout here, as a request does in g
+_local = threading.local()
+
+
+def _checkout(db_path):
+    # Pinned for the whole request, so every read and every version tag in one
+    # request comes from the same copy of the data.
+    if not has_request_context():
+        pinned = getattr(_local, "checkouts", {})
+        return pinned.get(db_path) or Checkout(*resolve_source(db_path), None, None)
+    held = g.setdefault("_db_connections", {})
+    if db_path not in held:
+        held[db_path] = checkout(db_path)
+    return held[db_path]
+
+
+def database_version(db_path):
+    """Version of the data reads of db_path currently see."""
+    return _checkout(db_path).version
+
+
+def sync(db_path):
+    """Re-copy the snapshot if cp.db moved on, then bring every cache up to date."""
+    if _snapshots is not None:
+        _snapshots.refresh(db_path)
+    refresh_caches(db_path)
+
+
+# ---- Flask request binding ----
+def get_db(db_path):
+    """The connection for this request, checked out of the pool on first use."""
+    return _checkout(db_path).conn
+
+
+def release_request_connections(exc=None):
+    held = g.pop("_db_connections", None)
+    if not held:
+        return
+    for held_checkout in held.values():
+        held_checkout.pool.release(held_checkout.conn)
+
+
+class VersionedCache:
+    """One value per database, rebuilt by build(conn, db_path) whenever database_version() changes.
+
+    If refresh(old_value, conn, db_path) is given it is tried first and may
+    return None to ask for a full build. New values replace old ones whole, so
+    a reader holding the previous value never sees it half-updated.
+    """
+
+    def __init__(self, build, refresh=None, name=None):
+        self.build = build
+        self.refresh = refresh
+        self.name = name or build.__name__
+        self.hits = 0
+        self.refreshes = 0
+        self.builds = 0
+        self._values = {}
+        self._lock = threading.Lock()
+        _caches.append(self)
+
+    def get(self, conn, db_path):
+        version = database_version(db_path)
+        with self._lock:
+            cached = self._values.get(db_path)
+        if cached and cached[0] == version:
+            self.hits += 1
+            return cached[1]
+        value = None
+        if cached and self.refresh:
+            value = self.refresh(cached[1], conn, db_path)
+            if value is not None:
+                self.refreshes += 1
+        if value is None:
+            value = self.build(conn, db_path)
+            self.builds += 1
+        with self._lock:
+            self._values[db_path] = (version, value)
+        return value
+
+    def clear(self):
+        with self._lock:
+            self._values.clear()
+
+
+_caches = []
+
+
+def cache_stats():
+    """{name: (hits, misses)} of every VersionedCache; refreshes and builds are misses."""
+    return {cache.name: (cache.hits, cache.refreshes + cache.builds) for cache in _caches}
+
+
+def with_connection(db_path, fn):
+    """fn(conn) on a pooled connection to what requests read for db_path, outside a request."""
+    held = checkout(db_path)
+    pinned = _local.__dict__.setdefault("checkouts", {})
+    outer = pinned.get(db_path)
+    pinned[db_path] = held
+    try:
+        return fn(held.conn)
+    finally:
+        if outer is None:
+            pinned.pop(db_path, None)
+        else:
+            pinned[db_path] = outer
+        held.pool.release(held.conn)
+
+
+def refresh_caches(db_path):
+    """Bring every VersionedCache up to date with db_path, off the request path."""
+    def refresh(conn):
+        for cache in list(_caches):
+            cache.get(conn, db_path)
+    with_connection(db_path, refresh)
+
+
+# ---- Incremental refresh ----
+# The game only ever appends careers and pilots while a campaign is played;
+# a (row count, max id) watermark tells appends apart from deletions.
+TableWatermark = namedtuple("TableWatermark", "count max_id")
+
+
+def _read_watermark(conn, table):
+    count, max_id = conn.execute(
+        f"SELECT COUNT(*), IFNULL(MAX(id), 0) FROM {table}"
+    ).fetchone()
+    return TableWatermark(count, max_id)
+
+
+def read_rows(conn, table, columns):
+    """(all rows ordered by id, watermark), read from one snapshot."""
+    conn.execute("BEGIN")
+    try:
+        watermark = _read_watermark(conn, table)
+        rows = conn.execute(f"SELECT {columns} FROM {table} ORDER BY id").fetchall()
+    finally:
+        conn.execute("COMMIT")
+    return rows, watermark
+
+
+def appended_rows(conn, table, columns, watermark):
+    """(rows added since watermark, new watermark), or None if rows were removed too."""
+    conn.execute("BEGIN")
+    try:
+        current = _read_watermark(conn, table)
+        rows = conn.execute(
+            f"SELECT {columns} FROM {table} WHERE id > ? ORDER BY id", (watermark.max_id,)
+        ).fetchall()
+    finally:
+        conn.execute("COMMIT")
+    if current.max_id < watermark.max_id or watermark.count + len(rows) != current.count:
+        return None
+    return rows, current
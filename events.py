@@ -0,0 +1,188 @@
+import os
+import json
+import time
+import queue
+import threading
+from collections import namedtuple
+import db
+import sources
+
+HEARTBEAT_SECONDS = 15
+# Each open stream holds a server thread: at most MAX_STREAMS at once (server.py
+# adds as many threads to waitress), each ended after STREAM_LIFETIME seconds so
+# the browser reconnects and streams of closed tabs are cleared out
+MAX_STREAMS = int(os.environ.get("IL2_PASSPORT_MAX_STREAMS", "4"))
+STREAM_LIFETIME = 300
+RETRY_MS = 3000
+CLIENT_QUEUE_SIZE = 100
+# Maximum number of descriptions sent in one "career" event; beyond it clients reload everything
+MAX_CHANGED_PILOTS = 200
+
+_CLOSE = object()
+
+
+class EventBroker:
+    """Fans server-sent events out to every open /api/events stream.
+
+    An open stream is also the page's liveness signal: idle_seconds() stays 0
+    while at least one client is connected.
+    """
+
+    def __init__(self):
+        self._clients = set()
+        self._lock = threading.Lock()
+        self._last_seen = time.time()
+        self.closed = False
+
+    def subscribe(self):
+        client = queue.Queue(maxsize=CLIENT_QUEUE_SIZE)
+        with self._lock:
+            self._clients.add(client)
+        return client
+
+    def unsubscribe(self, client):
+        with self._lock:
+            self._clients.discard(client)
+            self._last_seen = time.time()
+
+    def client_count(self):
+        with self._lock:
+            return len(self._clients)
+
+    def full(self):
+        return self.client_count() >= MAX_STREAMS
+
+    def idle_seconds(self):
+        with self._lock:
+            return 0 if self._clients else time.time() - self._last_seen
+
+    def publish(self, event, data):
+        with self._lock:
+            clients = list(self._clients)
+        for client in clients:
+            try:
+                client.put_nowait((event, data))
+            except queue.Full:
+                pass  # a stalled client; it reloads when it reconnects
+
+    def close(self):
+        """End every stream, e.g. before shutting down."""
+        with self._lock:
+            self.closed = True
+            clients = list(self._clients)
+        for client in clients:
+            try:
+                client.put_nowait(_CLOSE)
+            except queue.Full:
+                pass
+
+    def stream(self):
+        """The text/event-stream body of one client.
+
+        The client subscribes when the body is first read, so a response that
+        is never sent leaves no subscriber behind.
+        """
+        client = self.subscribe()
+        deadline = time.time() + STREAM_LIFETIME
+        try:
+            yield f"retry: {RETRY_MS}\n\n"
+            while not self.closed:
+                remaining = deadline - time.time()
+                if remaining <= 0:
+                    return  # the browser reconnects after RETRY_MS
+                try:
+                    item = client.get(timeout=min(HEARTBEAT_SECONDS, remaining))
+                except queue.Empty:
+                    # Comment line: keeps proxies from timing out, and a write to
+                    # a closed tab is how a disconnect is noticed
+                    yield ": keep-alive\n\n"
+                    continue
+                if item is _CLOSE:
+                    return
+                event, data = item
+                yield f"event: {event}\ndata: {json.dumps(data)}\n\n"
+        finally:
+            self.unsubscribe(client)
+
+
+broker = EventBroker()
+
+
+# ---- Change detection between two syncs of cp.db ----
+# The game appends sortie and event rows when a mission is saved, so rows past
+# the previous max rowid tell whose career changed; pilot rows also carry
+# (count, max id) so new and deleted careers show up as a roster change.
+ChangeMarks = namedtuple("ChangeMarks", "sortie event pilot")
+
+
+def read_marks(conn):
+    sortie = conn.execute("SELECT IFNULL(MAX(rowid), 0) FROM sortie").fetchone()[0]
+    event = conn.execute("SELECT IFNULL(MAX(rowid), 0) FROM event").fetchone()[0]
+    count, max_id = conn.execute("SELECT COUNT(*), IFNULL(MAX(id), 0) FROM pilot").fetchone()
+    return ChangeMarks(sortie, event, db.TableWatermark(count, max_id))
+
+
+def changed_pilots(conn, before, after):
+    """(descriptions whose sorties/events/careers changed, whether the pilot list changed)."""
+    pilot_ids = set()
+    for table, mark in (("sortie", before.sortie), ("event", before.event)):
+        pilot_ids.update(row[0] for row in conn.execute(
+            f"SELECT DISTINCT pilotId FROM {table} WHERE rowid > ?", (mark,)
+        ))
+    new_pilots = [row[0] for row in conn.execute(
+        "SELECT id FROM pilot WHERE id > ?", (before.pilot.max_id,)
+    )]
+    pilot_ids.update(new_pilots)
+    roster = bool(new_pilots) or after.pilot.count != before.pilot.count + len(new_pilots)
+    descs = set()
+    ids = sorted(pilot_ids)
+    for start in range(0, len(ids), 500):
+        chunk = ids[start:start + 500]
+        descs.update(row[0] for row in conn.execute(
+            f"SELECT DISTINCT description FROM pilot WHERE id IN ({','.join('?' * len(chunk))})",
+            chunk
+        ))
+    return sorted(descs), roster
+
+
+_marks = {}
+_marks_lock = threading.Lock()
+
+
+def publish_changes(db_path, source=sources.LIVE):
+    """Compare db_path with the previous call and send a "career" event if pilots changed.
+
+    source is the id of the database in multi-database mode, so pages can tell
+    which source's pilots the descriptions belong to.
+    """
+    def detect(conn):
+        # One read transaction, so the marks and the changed rows agree
+        conn.execute("BEGIN")
+        try:
+            after = read_marks(conn)
+            with _marks_lock:
+                before = _marks.get(db_path)
+                _marks[db_path] = after
+            if before is None or before == after:
+                return None
+            return changed_pilots(conn, before, after)
+        finally:
+            conn.execute("COMMIT")
+
+    changes = db.with_connection(db_path, detect)
+    if not changes:
+        return
+    descs, roster = changes
+    if not descs and not roster:
+        return
+    if len(descs) > MAX_CHANGED_PILOTS:
+        broker.publish("career", {"pilots": [], "roster": True, "all": True, "source": source})
+    else:
+        broker.publish("career", {"pilots": descs, "roster": roster, "all": False, "source": source})
+    print(f"{source} cp.db changes pushed: {len(descs)} pilot(s), roster changed: {roster}")
+
+
+def forget(db_path):
+    """Drop the marks of a database that is no longer served (game path changed)."""
+    with _marks_lock:
+        _marks.pop(db_path, None)
@@ -1,9 +1,19 @@
 import os
 import re
 import hashlib
-import shutil
+from functools import lru_cache
+import asset_sync
+import metrics
+
+COUNTRY_NAMES = {
+    101: "Soviet Union",
+    102: "Great Britain",
+    103: "United States of America",
+    201: "Germany"
+}
 
 def ensure_charactersranks(mod_src, dest_dir):
+    """Mirror mod_src into dest_dir; the asset_sync.SyncReport, or False on failure."""
 
     print(f"[ensure_charactersranks] Called with mod_src={mod_src}, dest_dir={dest_dir}")
 
@@ -16,27 +26,29 @@ def ensure_charactersranks(mod_src, dest_dir):
         print("ERROR: Mod files (101000/big.png) not found in mod_src.")
         return False
 
-    user_sample = os.path.join(dest_dir, "101000", "big.png")
-    if os.path.exists(user_sample):
-        print("INFO: charactersranks already present in dest_dir. No copy performed.")
-        return True
-
-    if os.path.exists(dest_dir):
-        try:
-            shutil.rmtree(dest_dir)
-        except Exception as e:
-            print(f"ERROR: Could not remove old dest_dir: {e}")
-            return False
-
+    # Incremental: only new/changed files are copied and files gone from the mod removed
     try:
-        shutil.copytree(mod_src, dest_dir)
-        print("SUCCESS: Copied modded charactersranks to dest_dir.")
-        return True
-    except Exception as e:
-        print(f"ERROR: Failed to copy charactersranks: {e}")
+        report = asset_sync.sync_tree(mod_src, dest_dir)
+    except OSError as e:
+        print(f"ERROR: Failed to sync charactersranks: {e}")
         return False
+    print(
+        f"SUCCESS: charactersranks synced in {report.seconds:.2f}s: "
+        f"{len(report.added)} added, {len(report.updated)} updated, "
+        f"{len(report.removed)} removed, {report.unchanged} unchanged."
+    )
+    return report
 
 
+def sync_mod_charactersranks(game_path, dest_dir):
+    """Sync the game's modded charactersranks into dest_dir, if the game has them."""
+    mod_src = os.path.join(game_path, "data", "swf", "il2", "charactersranks")
+    if not os.path.isdir(mod_src):
+        print("No modded charactersranks found. Fallback to standard_charactersranks only.")
+        return False
+    print(f"Calling ensure_charactersranks with: {mod_src}, {dest_dir}")
+    return ensure_charactersranks(mod_src, dest_dir)
+
 
         
 def extract_country_id(description):
@@ -58,6 +70,32 @@ def extract_birthdate(description):
             return dt
     return ""
 
+# Sortie logs repeat the same handful of aircraft and mission templates,
+# so both normalizers are memoized.
+@lru_cache(maxsize=4096)
+def extract_plane_name(raw_model):
+    if not raw_model:
+        return ""
+    try:
+        base = raw_model.split("/")[-1]
+        name = base.replace(".txt", "")
+        return name.upper()
+    except Exception:
+        return raw_model.upper()
+
+@lru_cache(maxsize=4096)
+def normalize_mtemplate(template):
+    if not template:
+        return ""
+    if '@' in template:
+        template = template.split('@', 1)[0]
+    else:
+        idx = template.find('_p0')
+        if idx != -1:
+            template = template[:idx]
+    template = template.replace('-', ' ').replace('_', ' ').strip()
+    return " ".join(word.capitalize() for word in template.split())
+
 def get_latest_pilot(conn, desc):
     cur = conn.cursor()
     cur.execute(
@@ -69,30 +107,20 @@ def get_latest_pilot(conn, desc):
     
 def collect_career_chain(conn, starting_career_id):
     """Traverse both up and down the chain, collecting all related career ids."""
-    # Traverse up to find the root
-    cur = conn.cursor()
-    chain = set()
-    current = starting_career_id
-    while True:
-        chain.add(current)
-        cur.execute("SELECT extends FROM career WHERE id=?", (current,))
-        row = cur.fetchone()
-        if row and row[0] != -1:
-            current = row[0]
-        else:
-            break
-
-    # Traverse down (find all who extend any in the chain)
-    added = True
-    while added:
-        added = False
-        cur.execute("SELECT id, extends FROM career")
-        for row in cur.fetchall():
-            id_, ext = row
-            if ext in chain and id_ not in chain:
-                chain.add(id_)
-                added = True
-    return list(chain)
+    from career_graph import build_career_graph
+    return build_career_graph(conn).chain(starting_career_id)
+
+def db_signature(db_path):
+    """(mtime, size) of cp.db and its WAL file; changes whenever the game writes."""
+    signature = []
+    for path in (db_path, db_path + "-wal"):
+        try:
+            st = os.stat(path)
+        except OSError:
+            signature.append(None)
+            continue
+        signature.append((st.st_mtime_ns, st.st_size))
+    return tuple(signature)
 
 def get_squadron_shortname(squadron_id, conn, STATIC_ROOT):
     if not squadron_id:
@@ -107,7 +135,12 @@ def get_squadron_shortname(squadron_id, conn, STATIC_ROOT):
     info_file = os.path.join(folder, "info.locale=eng.txt")
     if not os.path.isfile(info_file):
         return "Unknown"
-    with open(info_file, encoding="utf-8") as f:
+    return read_squadron_shortname(info_file)
+
+def read_squadron_shortname(info_file):
+    metrics.count_probe("read_squadron_shortname")
+    # A few shipped info files are not valid UTF-8; don't let one break the roster
+    with open(info_file, encoding="utf-8", errors="replace") as f:
         for line in f:
             line = line.strip()
             if line.startswith("*"):
@@ -122,19 +155,24 @@ def get_squadron_shortname(squadron_id, conn, STATIC_ROOT):
                         return fields[-1].strip().strip('"')
     return "Unknown"
 
+def read_info_name(info_path):
+    """The &name="..." value of an info.locale file, or None."""
+    metrics.count_probe("read_info_name")
+    with open(info_path, encoding="utf-8", errors="replace") as f:
+        for line in f:
+            if "&name=" in line:
+                match = re.search(r'&name\s*=\s*"([^"]+)"', line)
+                if match:
+                    return match.group(1)
+    return None
+
 
 def get_award_name_static(tpar2, STATIC_ROOT):
     info_path = os.path.join(STATIC_ROOT, 'achievements', str(tpar2), 'info.locale=eng.txt')
     if not os.path.isfile(info_path):
         return tpar2  # fallback, just the code
     try:
-        with open(info_path, encoding='utf-8') as f:
-            for line in f:
-                if '&name=' in line:
-                    match = re.search(r'&name\s*=\s*"([^"]+)"', line)
-                    if match:
-                        return match.group(1)
-        return tpar2
+        return read_info_name(info_path) or tpar2
     except Exception:
         return tpar2
 
@@ -149,12 +187,9 @@ def get_rank_name(country, rank_id, STATIC_ROOT, game_path=None, CHARACTERSRANKS
     paths_to_try.append(standard_static_path)
     for info_path in paths_to_try:
         if os.path.isfile(info_path):
-            with open(info_path, encoding="utf-8") as f:
-                for line in f:
-                    if "&name=" in line:
-                        match = re.search(r'&name\s*=\s*"([^"]+)"', line)
-                        if match:
-                            return match.group(1)
+            name = read_info_name(info_path)
+            if name:
+                return name
     return f"Rank {rank_id}"
 
 
@@ -171,13 +206,9 @@ def get_photo_path_for_desc(desc, PILOT_PHOTO_DIR, frozen):
     return "/static/images/sample_photo.jpg"
     
 def find_chain_tip(conn, chain_ids):
-    cur = conn.cursor()
-    cur.execute("SELECT extends FROM career WHERE extends != -1")
-    all_extends = set(row[0] for row in cur.fetchall())
+    from career_graph import build_career_graph
     # The tip is a chain id that is not extended by anyone else
-    tips = [cid for cid in chain_ids if cid not in all_extends]
-    # Normally only one, but if not, pick the highest (latest)
-    return tips[-1] if tips else chain_ids[0]
+    return build_career_graph(conn).tip(chain_ids)
     
 def get_rank_image_path(country, rank_id, date_str, STATIC_ROOT, CHARACTERSRANKS_DIR=None, FROZEN=False):
     folder = str(country * 1000 + rank_id)
@@ -0,0 +1,298 @@
+import os
+import time
+import pstats
+import sqlite3
+import cProfile
+import threading
+from bisect import bisect_left
+from flask import g, request, jsonify
+
+# Upper bounds of the latency buckets, in milliseconds (plus one for anything slower)
+LATENCY_BUCKETS_MS = (1, 2.5, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000)
+PROFILE_TOP = 40
+
+
+class Histogram:
+    """Fixed-bucket latency histogram; quantiles are bucket upper bounds."""
+
+    def __init__(self, bounds=LATENCY_BUCKETS_MS):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def observe(self, ms):
+        self.counts[bisect_left(self.bounds, ms)] += 1
+        self.count += 1
+        self.total += ms
+        self.max = max(self.max, ms)
+
+    def quantile(self, q):
+        if not self.count:
+            return None
+        seen = 0
+        for bound, n in zip(self.bounds, self.counts):
+            seen += n
+            if seen >= q * self.count:
+                return bound
+        return self.max
+
+    def as_dict(self):
+        buckets = {f"le_{b:g}": n for b, n in zip(self.bounds, self.counts)}
+        buckets["le_inf"] = self.counts[-1]
+        return {
+            "count": self.count,
+            "mean_ms": round(self.total / self.count, 3) if self.count else None,
+            "max_ms": round(self.max, 3),
+            "p50_ms": self.quantile(0.5),
+            "p95_ms": self.quantile(0.95),
+            "p99_ms": self.quantile(0.99),
+            "buckets": buckets,
+        }
+
+
+class Tally:
+    """SQL statements, rows fetched and filesystem probes made by one thread."""
+
+    __slots__ = ("statements", "rows", "probes")
+
+    def __init__(self):
+        self.statements = 0
+        self.rows = 0
+        self.probes = {}
+
+    def add(self, other):
+        self.statements += other.statements
+        self.rows += other.rows
+        for resolver, n in other.probes.items():
+            self.probes[resolver] = self.probes.get(resolver, 0) + n
+
+    def as_dict(self):
+        return {"sql_statements": self.statements, "sql_rows": self.rows,
+                "fs_probes": dict(sorted(self.probes.items()))}
+
+
+class EndpointStats:
+    def __init__(self):
+        self.latency = Histogram()
+        self.errors = 0
+        self.tally = Tally()
+
+    def as_dict(self):
+        count = self.latency.count or 1
+        return dict(
+            self.latency.as_dict(),
+            errors=self.errors,
+            sql_statements_per_request=round(self.tally.statements / count, 2),
+            sql_rows_per_request=round(self.tally.rows / count, 2),
+            **self.tally.as_dict()
+        )
+
+
+# Each thread counts into its own Tally: the current request's while one is
+# running, otherwise a per-thread one reported under "background".
+_local = threading.local()
+_background = []
+_endpoints = {}
+_lock = threading.Lock()
+_profile_lock = threading.Lock()
+_started = time.time()
+# Endpoints whose body never ends, so it cannot be collected into a profile
+_streaming = set()
+
+
+def _tally():
+    tally = getattr(_local, "tally", None)
+    if tally is None:
+        tally = _local.tally = Tally()
+        with _lock:
+            _background.append(tally)
+    return tally
+
+
+def carry_tally(fn):
+    """fn, counting into the calling thread's Tally when it runs on a pool thread."""
+    tally = _tally()
+
+    def run(*args, **kwargs):
+        previous = getattr(_local, "tally", None)
+        _local.tally = tally
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            _local.tally = previous
+    return run
+
+
+def count_probe(resolver):
+    probes = _tally().probes
+    probes[resolver] = probes.get(resolver, 0) + 1
+
+
+# ---- SQL counting: db.open_readonly() connects with factory=CountingConnection ----
+class CountingCursor(sqlite3.Cursor):
+    def execute(self, sql, parameters=()):
+        _tally().statements += 1
+        return super().execute(sql, parameters)
+
+    def executemany(self, sql, seq_of_parameters):
+        _tally().statements += 1
+        return super().executemany(sql, seq_of_parameters)
+
+    def executescript(self, sql_script):
+        _tally().statements += 1
+        return super().executescript(sql_script)
+
+    def fetchone(self):
+        row = super().fetchone()
+        if row is not None:
+            _tally().rows += 1
+        return row
+
+    def fetchmany(self, size=None):
+        rows = super().fetchmany(self.arraysize if size is None else size)
+        _tally().rows += len(rows)
+        return rows
+
+    def fetchall(self):
+        rows = super().fetchall()
+        _tally().rows += len(rows)
+        return rows
+
+    def __next__(self):
+        row = super().__next__()
+        _tally().rows += 1
+        return row
+
+
+class CountingConnection(sqlite3.Connection):
+    """sqlite3.Connection whose cursors count statements and rows into the current Tally."""
+
+    def cursor(self, factory=CountingCursor):
+        return super().cursor(factory)
+
+    def execute(self, sql, parameters=()):
+        return self.cursor().execute(sql, parameters)
+
+    def executemany(self, sql, seq_of_parameters):
+        return self.cursor().executemany(sql, seq_of_parameters)
+
+    def executescript(self, sql_script):
+        return self.cursor().executescript(sql_script)
+
+
+# ---- Request hooks ----
+def instrument(blueprint, streaming=()):
+    """Time every request of blueprint and attribute its SQL and file probes to the endpoint.
+
+    streaming names endpoints that answer with an endless stream; ?profile=1 is refused for them.
+    """
+    _streaming.update(streaming)
+    blueprint.before_request(_begin_request)
+    blueprint.after_request(_after_request)
+    blueprint.teardown_request(_end_request)
+
+
+def profiling():
+    """True while the current request runs under ?profile=1 (and must not be served from cache)."""
+    return getattr(g, "_metrics_profiler", None) is not None
+
+
+def _begin_request():
+    g._metrics_started = time.perf_counter()
+    g._metrics_status = None
+    _local.tally = Tally()
+    if request.args.get("profile") == "1":
+        if request.endpoint in _streaming:
+            return jsonify({"error": "Event streams cannot be profiled"}), 400
+        # cProfile can only trace one request at a time
+        if not _profile_lock.acquire(blocking=False):
+            return jsonify({"error": "Another request is being profiled"}), 409
+        g._metrics_profiler = cProfile.Profile()
+        g._metrics_profiler.enable()
+
+
+def _after_request(response):
+    profiler = getattr(g, "_metrics_profiler", None)
+    if profiler is None:
+        g._metrics_status = response.status_code
+        return response
+    # Streamed bodies are produced here, so they are part of the profile too
+    body = response.get_data()
+    profiler.disable()
+    g._metrics_status = response.status_code
+    summary = dict(
+        endpoint=request.endpoint,
+        status=response.status_code,
+        bytes=len(body),
+        elapsed_ms=round((time.perf_counter() - g._metrics_started) * 1000, 3),
+        profile=profile_summary(profiler),
+        **_local.tally.as_dict()
+    )
+    return jsonify(summary)
+
+
+def _end_request(exc=None):
+    started = getattr(g, "_metrics_started", None)
+    if started is None:
+        return
+    ms = (time.perf_counter() - started) * 1000
+    tally, _local.tally = _local.tally, None
+    if getattr(g, "_metrics_profiler", None) is not None:
+        g._metrics_profiler = None
+        _profile_lock.release()
+    status = 500 if exc is not None else g._metrics_status
+    with _lock:
+        stats = _endpoints.get(request.endpoint)
+        if stats is None:
+            stats = _endpoints[request.endpoint] = EndpointStats()
+        stats.latency.observe(ms)
+        stats.tally.add(tally)
+        if status is None or status >= 500:
+            stats.errors += 1
+
+
+def profile_summary(profiler, top=PROFILE_TOP):
+    """The top functions of a cProfile run by cumulative time."""
+    stats = pstats.Stats(profiler)
+    stats.sort_stats("cumulative")
+    summary = []
+    for func in stats.fcn_list[:top]:
+        primitive, calls, own, cumulative, _ = stats.stats[func]
+        filename, line, name = func
+        where = f"{os.path.basename(filename)}:{line}" if line else filename
+        summary.append({
+            "function": f"{where}({name})",
+            "calls": calls,
+            "primitive_calls": primitive,
+            "tottime_ms": round(own * 1000, 3),
+            "cumtime_ms": round(cumulative * 1000, 3),
+        })
+    return summary
+
+
+# ---- Report ----
+def hit_rate(hits, misses):
+    total = hits + misses
+    return {"hits": hits, "misses": misses,
+            "hit_rate": round(hits / total, 4) if total else None}
+
+
+def snapshot():
+    """Per-endpoint latency and SQL/probe counts, plus the totals of background threads."""
+    background = Tally()
+    with _lock:
+        endpoints = {name: stats.as_dict() for name, stats in sorted(_endpoints.items())}
+        for tally in _background:
+            background.add(tally)
+        totals = Tally()
+        for stats in _endpoints.values():
+            totals.add(stats.tally)
+    totals.add(background)
+    return {
+        "uptime": round(time.time() - _started, 1),
+        "endpoints": endpoints,
+        "background": background.as_dict(),
+        "totals": totals.as_dict(),
+    }
@@ -0,0 +1,167 @@
+import os
+import re
+import io
+import zlib
+import base64
+import struct
+import hashlib
+from flask import send_from_directory
+
+try:
+    # Optional: accepts any image format; without it uploads must be PNGs that fit
+    from PIL import Image
+except ImportError:
+    Image = None
+
+MAX_UPLOAD_BYTES = 8 * 1024 * 1024
+MAX_SOURCE_PIXELS = 40 * 1000 * 1000
+PHOTO_SIZE = (360, 440)  # twice the 180x220 passport frame
+PHOTO_MAX_AGE = 365 * 24 * 3600
+
+DATA_URL_RE = re.compile(r"^data:image/[\w.+-]+;base64,")
+# <pilot hash>.<content hash>.png; older uploads are plain <pilot hash>.png
+PHOTO_NAME_RE = re.compile(r"^(?P<pilot>[0-9a-f]{20})(?:\.(?P<content>[0-9a-f]{12}))?\.png$")
+PNG_SIGNATURE = b"\x89PNG\r\n\x1a\n"
+# Samples per pixel of the 8-bit PNG color types read without Pillow:
+# grey, RGB, grey + alpha, RGBA (what a browser canvas exports)
+PNG_CHANNELS = {0: 1, 2: 3, 4: 2, 6: 4}
+
+
+class PhotoError(ValueError):
+    pass
+
+
+def decode_data_url(img_data):
+    """The raw bytes of a base64 data URL, bounded by MAX_UPLOAD_BYTES."""
+    b64 = DATA_URL_RE.sub("", img_data, count=1)
+    if len(b64) > MAX_UPLOAD_BYTES * 4 // 3 + 4:
+        raise PhotoError("Image is too large")
+    try:
+        return base64.b64decode(b64, validate=True)
+    except ValueError:
+        raise PhotoError("Image data is not valid base64")
+
+
+def _png_chunks(raw):
+    """(type, data) of every chunk up to IEND, checking lengths and CRCs."""
+    if raw[:8] != PNG_SIGNATURE:
+        raise PhotoError("Unsupported image format (PNG expected)")
+    pos = 8
+    while True:
+        if pos + 12 > len(raw):
+            raise PhotoError("PNG is truncated")
+        length, kind = struct.unpack(">I4s", raw[pos:pos + 8])
+        end = pos + 8 + length
+        if end + 4 > len(raw):
+            raise PhotoError("PNG is truncated")
+        data = raw[pos + 8:end]
+        if struct.unpack(">I", raw[end:end + 4])[0] != zlib.crc32(kind + data):
+            raise PhotoError("PNG is corrupt")
+        yield kind, data
+        if kind == b"IEND":
+            return
+        pos = end + 4
+
+
+def reencode_png(raw):
+    """Decode a whole 8-bit, non-interlaced PNG and write it again, without Pillow.
+
+    Every chunk and the complete pixel stream are checked; the copy keeps only
+    the image data, recompressed, so trailing garbage and metadata are dropped.
+    """
+    header, idat = None, []
+    for kind, data in _png_chunks(raw):
+        if header is None:
+            if kind != b"IHDR" or len(data) != 13:
+                raise PhotoError("PNG is corrupt")
+            header = data
+        elif kind == b"IDAT":
+            idat.append(data)
+        elif kind[0] & 0x20 == 0 and kind != b"IEND":
+            # PLTE and unknown critical chunks
+            raise PhotoError("Unsupported PNG (8-bit grey or RGB(A) expected)")
+    width, height, depth, color, compression, filtering, interlace = struct.unpack(">IIBBBBB", header)
+    if depth != 8 or color not in PNG_CHANNELS or compression or filtering or interlace:
+        raise PhotoError("Unsupported PNG (8-bit grey or RGB(A), not interlaced, expected)")
+    if not width or not height or width > PHOTO_SIZE[0] or height > PHOTO_SIZE[1]:
+        raise PhotoError(f"Image must be at most {PHOTO_SIZE[0]}x{PHOTO_SIZE[1]} pixels")
+
+    stride = width * PNG_CHANNELS[color] + 1  # a filter-type byte per row
+    expected = stride * height
+    inflater = zlib.decompressobj()
+    try:
+        pixels = inflater.decompress(b"".join(idat), expected + 1)
+    except zlib.error:
+        raise PhotoError("PNG is corrupt")
+    if len(pixels) != expected or not inflater.eof or inflater.unconsumed_tail:
+        raise PhotoError("PNG image data is incomplete")
+    if any(f > 4 for f in pixels[::stride]):
+        raise PhotoError("PNG is corrupt")
+
+    def chunk(kind, data):
+        return struct.pack(">I", len(data)) + kind + data + struct.pack(">I", zlib.crc32(kind + data))
+    return (PNG_SIGNATURE + chunk(b"IHDR", header)
+            + chunk(b"IDAT", zlib.compress(pixels, 9)) + chunk(b"IEND", b""))
+
+
+def _encode(image, size):
+    out = image.copy()
+    out.thumbnail(size, Image.LANCZOS)
+    buf = io.BytesIO()
+    out.save(buf, "PNG", optimize=True)
+    return buf.getvalue()
+
+
+def render_photo(raw):
+    """The PNG to store for an upload: re-encoded to fit PHOTO_SIZE with Pillow,
+    otherwise decoded and rewritten by reencode_png() if it already fits."""
+    if Image is None:
+        return reencode_png(raw)
+
+    try:
+        with Image.open(io.BytesIO(raw)) as probe:
+            if probe.width * probe.height > MAX_SOURCE_PIXELS:
+                raise PhotoError("Image is too large")
+            probe.verify()
+        image = Image.open(io.BytesIO(raw))
+        image.load()
+    except PhotoError:
+        raise
+    except Exception:
+        raise PhotoError("Not a valid image")
+    image = image.convert("RGBA" if "A" in image.getbands() else "RGB")
+    return _encode(image, PHOTO_SIZE)
+
+
+def _write_atomic(path, data):
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(data)
+    os.replace(tmp_path, path)
+
+
+def save_photo(PILOT_PHOTO_DIR, pilot_hash, raw):
+    """Store an upload under a content-hash name and return that file name."""
+    data = render_photo(raw)
+    filename = f"{pilot_hash}.{hashlib.sha1(data).hexdigest()[:12]}.png"
+    _write_atomic(os.path.join(PILOT_PHOTO_DIR, filename), data)
+
+    # Previous uploads of this pilot are no longer referenced
+    for name in os.listdir(PILOT_PHOTO_DIR):
+        if name.startswith(pilot_hash + ".") and name != filename:
+            try:
+                os.remove(os.path.join(PILOT_PHOTO_DIR, name))
+            except OSError:
+                pass  # still being served (Windows); replaced again on the next upload
+    return filename
+
+
+def photo_response(PILOT_PHOTO_DIR, filename):
+    """Serve a stored photo; content-hashed names never change, so they are cached for good."""
+    match = PHOTO_NAME_RE.match(filename)
+    if not (match and match.group("content")):
+        # Older uploads are overwritten in place: revalidate every time
+        return send_from_directory(PILOT_PHOTO_DIR, filename)
+    response = send_from_directory(PILOT_PHOTO_DIR, filename, max_age=PHOTO_MAX_AGE)
+    response.cache_control.immutable = True
+    return response
@@ -0,0 +1,77 @@
+from collections import namedtuple
+import db
+import career_graph
+
+# Everything the pilot endpoints need to know about a description.
+# career_id/tip_pilot_id are None when the pilot has no career row.
+PilotResolution = namedtuple(
+    "PilotResolution", "pilot_id career_id chain pilot_ids tip_career_id tip_pilot_id"
+)
+
+
+class PilotIndex:
+    """description -> PilotResolution for every pilot in cp.db."""
+
+    def __init__(self, pilot_rows, graph, watermark=None):
+        self.pilot_rows = pilot_rows
+        self.graph = graph
+        self.watermark = watermark
+        self.by_desc = {}
+        resolved_chains = {}
+        for pilot_id, desc in pilot_rows:
+            # Several pilots (one per career of a chain) share a description;
+            # like "WHERE description = ?" the first one wins.
+            if desc in self.by_desc:
+                continue
+            career_id = graph.career_of_player.get(pilot_id)
+            if career_id is None:
+                self.by_desc[desc] = PilotResolution(pilot_id, None, (), (), None, None)
+                continue
+            tip_career_id = graph.tip_of(career_id)
+            chain = resolved_chains.get(tip_career_id)
+            if chain is None:
+                chain_ids = tuple(graph.chain(career_id))
+                chain = resolved_chains[tip_career_id] = (
+                    chain_ids, tuple(graph.chain_player_ids(chain_ids))
+                )
+            self.by_desc[desc] = PilotResolution(
+                pilot_id, career_id, chain[0], chain[1],
+                tip_career_id, graph.player_of.get(tip_career_id)
+            )
+
+    def resolve(self, desc):
+        return self.by_desc.get(desc)
+
+
+PILOT_COLUMNS = "id, description"
+
+
+def build_pilot_index(conn, db_path):
+    graph = career_graph.get_career_graph(conn, db_path)
+    rows, watermark = db.read_rows(conn, "pilot", PILOT_COLUMNS)
+    return PilotIndex(rows, graph, watermark)
+
+
+def refresh_pilot_index(index, conn, db_path):
+    """index re-resolved over the pilots added since it was built and the current
+    career graph (new careers move chain tips); None if pilots were deleted."""
+    graph = career_graph.get_career_graph(conn, db_path)
+    appended = db.appended_rows(conn, "pilot", PILOT_COLUMNS, index.watermark)
+    if appended is None:
+        return None
+    rows, watermark = appended
+    if not rows and graph is index.graph:
+        return index
+    return PilotIndex(index.pilot_rows + rows, graph, watermark)
+
+
+_indexes = db.VersionedCache(build_pilot_index, refresh_pilot_index, name="pilot_index")
+
+
+def get_pilot_index(conn, db_path):
+    return _indexes.get(conn, db_path)
+
+
+def resolve_pilot(conn, db_path, desc):
+    """The PilotResolution for desc, or None if no pilot has that description."""
+    return get_pilot_index(conn, db_path).resolve(desc)
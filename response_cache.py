@@ -0,0 +1,98 @@
+import os
+import hashlib
+import threading
+from collections import OrderedDict, namedtuple
+from functools import wraps
+from flask import current_app, request, Response
+import db
+import metrics
+import sources
+
+MAX_CACHE_BYTES = 32 * 1024 * 1024
+
+CachedResponse = namedtuple("CachedResponse", "version body mimetype etag")
+
+
+class ResponseCache:
+    """LRU of rendered API responses, bounded by total body size."""
+
+    def __init__(self, max_bytes=MAX_CACHE_BYTES):
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+    def get(self, key, version):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry.version != version:
+                self._discard(key)
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry
+
+    def put(self, key, entry):
+        size = len(entry.body)
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            self._discard(key)
+            self._entries[key] = entry
+            self._bytes += size
+            while self._bytes > self.max_bytes:
+                self._discard(next(iter(self._entries)))
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def _discard(self, key):
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self._bytes -= len(entry.body)
+
+
+response_cache = ResponseCache()
+
+
+def cached_response(view=None, *, all_sources=False):
+    """Serve a GET view from response_cache until cp.db changes, with ETag/304 support.
+
+    The entry is versioned by the database the request reads (its ?source=), or
+    with all_sources by every database, so a write to one archive only
+    invalidates the responses that use it.
+    """
+    if view is None:
+        return lambda view: cached_response(view, all_sources=all_sources)
+
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        db_paths = sources.request_db_paths(all_sources)
+        if (not db_paths or not all(p and os.path.isfile(p) for p in db_paths)
+                or metrics.profiling()):
+            return view(*args, **kwargs)
+
+        key = (request.endpoint, tuple(db_paths), tuple(sorted(request.args.items(multi=True))))
+        version = tuple(db.database_version(p) for p in db_paths)
+        entry = response_cache.get(key, version)
+        if entry is None:
+            response = current_app.make_response(view(*args, **kwargs))
+            if response.status_code != 200 or response.is_streamed:
+                return response
+            body = response.get_data()
+            entry = CachedResponse(version, body, response.mimetype,
+                                   hashlib.sha1(body).hexdigest())
+            response_cache.put(key, entry)
+
+        response = Response(entry.body, mimetype=entry.mimetype)
+        response.set_etag(entry.etag)
+        response.cache_control.no_cache = True
+        return response.make_conditional(request)
+    return wrapper
@@ -0,0 +1,38 @@
+import il2_core
+
+# One row per career with the pilot it points at and that pilot's squadron
+# config, so the roster needs no per-pilot lookups.
+ROSTER_QUERY = """
+    SELECT c.id, p.id, p.description, p.squadronId, s.configId
+    FROM career c
+    JOIN pilot p ON p.id = c.playerId
+    LEFT JOIN squadron s ON s.id = p.squadronId
+"""
+
+
+def build_roster(conn, graph, names, locale="eng"):
+    """One entry per root career, describing the pilot at the tip of its chain."""
+    cur = conn.cursor()
+    cur.execute(ROSTER_QUERY)
+    by_career = {row[0]: row[1:] for row in cur.fetchall()}
+
+    pilots = []
+    for root_id in graph.roots:
+        row = by_career.get(graph.tip_of(root_id))
+        if row is None:
+            continue
+        tip_pilot_id, desc, squadron_id, config_id = row
+        country_id = il2_core.extract_country_id(desc)
+        if squadron_id and config_id is not None:
+            squadron_short = names.squadron_name(config_id, locale)
+        else:
+            squadron_short = "Unknown"
+        pilots.append({
+            "desc": desc,
+            "display": il2_core.extract_fullname(desc),
+            "country": il2_core.COUNTRY_NAMES.get(country_id, "Unknown"),
+            "squadron": squadron_short,
+            "pilot_id": tip_pilot_id,
+            "root_career_id": root_id
+        })
+    return pilots
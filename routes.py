@@ -1,33 +1,88 @@
 import os
 import sqlite3
-import re
 import base64
-import hashlib
 import time
-import signal
 from collections import OrderedDict
-from flask import Blueprint, jsonify, request, current_app, Response
+from flask import Blueprint, jsonify, request, current_app, Response, stream_with_context
 import json
 import il2_core
+import career_graph
+import pilot_index
+import catalog
+import asset_index
+import photo_store
+import db
+import roster
+import sidecar
+import startup
+import schema_registry
+import sortie_buckets
+import metrics
+import server
+import events
+import sources
+from response_cache import cached_response, response_cache
 from config import save_config, clear_config
 
 api_bp = Blueprint("api", __name__)
+api_bp.teardown_app_request(db.release_request_connections)
+# Registered first, so requests turned away during startup are timed too
+metrics.instrument(api_bp, streaming=["api.api_events"])
+
+# Answered while the startup worker is still running; everything else waits for it
+STARTUP_EXEMPT_ENDPOINTS = {
+    "api.startup_status", "api.ping", "api.shutdown", "api.api_metrics", "api.api_events"
+}
+
+
+@api_bp.before_request
+def wait_for_startup():
+    if not startup.is_ready() and request.endpoint not in STARTUP_EXEMPT_ENDPOINTS:
+        return jsonify({"error": "Starting up", "startup": startup.state.status()}), 503
+
+
+@api_bp.before_request
+def check_source():
+    source = request.args.get("source")
+    if source and sources.source_path(current_app.config, source) is None:
+        return jsonify({"error": f"Unknown database source: {source}"}), 404
+
+
+@api_bp.route("/api/startup")
+def startup_status():
+    status = startup.state.status()
+    status["game_path_found"] = bool(current_app.config.get("DB_PATH"))
+    status["sources"] = [
+        {"id": s.id, "label": s.label} for s in sources.configured_sources(current_app.config)
+    ]
+    return jsonify(status)
+
+
+def get_catalog():
+    return catalog.get_catalog(
+        current_app.config["STATIC_ROOT"],
+        current_app.config.get("CHARACTERSRANKS_DIR"),
+        current_app.config.get("CONFIG_DIR"),
+    )
 
-# Use your *display order* in friendly_label form (see note below)
-stat_order_labels = [
-    "Flight Time", "Good Sorties", "Sorties", "Success Rate",
-    "Light Fighter", "Light Attack Plane", "Light Bomber", "Light Recon", "Light Transport",
-    "Medium Fighter", "Medium Attack Plane", "Medium Bomber", "Medium Recon", "Medium Transport",
-    "Heavy Fighter", "Heavy Attack Plane", "Heavy Bomber", "Heavy Recon", "Heavy Transport",
-    "Heavy Armoured", "Heavy Tank", "Medium Tank", "Vehicle", "Light Tank", "Armoured Vehicle",
-    "Truck", "Car", "Train Locomotive", "Train Vagon", "Howitzer", "Field Gun",
-    "Naval Gun", "Rocket Launcher", "Machine Gun", "Searchlight", "Static Plane",
-    "Air Defence", "Heavy Flak", "Light Flak", "AAA Machine Gun", "Ships",
-    "Light Ship", "Destroyer Ship", "Submarine", "Large Cargo Ship", "Building",
-    "Rural Yard", "Town Building", "Factory Building", "Railway Station Facility", "Bridge",
-    "Airfield Facility", "Air Crew", "Pilot", "Plane Gunner", "Driver", "Vehicle Gunner",
-    "Infantry", "Turrets", "Plane Turrets", "Vehicle Turrets", "Plane In Group", "Assist"
-]
+
+def get_assets():
+    return asset_index.get_asset_index(
+        current_app.config["STATIC_ROOT"],
+        charactersranks_dir(),
+        current_app.config["PILOT_PHOTO_DIR"],
+        current_app.config["FROZEN"],
+    )
+
+
+def request_locale(names):
+    """The ?locale= of the current request, if the catalog has it, else English."""
+    return names.resolve_locale(request.args.get("locale", catalog.DEFAULT_LOCALE))
+
+
+def request_db_path():
+    """The cp.db a pilot request reads: the ?source= archive, or the game's own."""
+    return sources.source_path(current_app.config, request.args.get("source"))
 
 @api_bp.route("/api/set_game_path", methods=["POST"])
 def set_game_path():
@@ -39,7 +94,16 @@ def set_game_path():
     if not os.path.isfile(db_candidate):
         return {"error": "cp.db not found in the provided path"}, 404
 
-    # Save config and update app config
+    # Save config and update app config; drop connections to the old database
+    old_db_path = current_app.config.get("DB_PATH")
+    changed = old_db_path is None or (
+        os.path.normcase(os.path.normpath(old_db_path)) != os.path.normcase(os.path.normpath(db_candidate))
+    )
+    if old_db_path and changed:
+        db.close_pool(old_db_path)
+        sidecar.discard(old_db_path)
+        events.forget(old_db_path)
+        sources.rosters.forget(old_db_path)
     current_app.config["GAME_PATH"] = user_path
     current_app.config["DB_PATH"] = db_candidate
     save_config(user_path)
@@ -55,15 +119,19 @@ def set_game_path():
     os.makedirs(CHARACTERSRANKS_DIR, exist_ok=True)
 
     # Only copy if mod folder exists, else skip
-    mod_src = os.path.join(user_path, "data", "swf", "il2", "charactersranks")
-    if os.path.isdir(mod_src):
-        print(f"Calling ensure_charactersranks with: {mod_src}, {CHARACTERSRANKS_DIR}")
-        il2_core.ensure_charactersranks(mod_src, CHARACTERSRANKS_DIR)
-    else:
-        print("No modded charactersranks found. Fallback to standard_charactersranks only.")
+    report = il2_core.sync_mod_charactersranks(user_path, CHARACTERSRANKS_DIR)
     current_app.config["CHARACTERSRANKS_DIR"] = CHARACTERSRANKS_DIR
-
-    return {"ok": True, "game_path": user_path, "db_path": db_candidate}
+    # The page re-posts its saved path on every load: keep the cache (and its ETags) unless something moved
+    if changed or (report and (report.added or report.updated or report.removed)):
+        response_cache.clear()
+
+    result = {"ok": True, "game_path": user_path, "db_path": db_candidate}
+    if report:
+        result["charactersranks"] = {
+            "added": len(report.added), "updated": len(report.updated),
+            "removed": len(report.removed), "unchanged": report.unchanged,
+        }
+    return result
 
 
 
@@ -75,156 +143,111 @@ def save_photo():
     img_data = request.form.get("img_data")
     if not img_data:
         return {"error": "No image data"}, 400
-    img_str = re.sub(r"^data:image/\w+;base64,", "", img_data)
-    img_bytes = base64.b64decode(img_str)
-    pilot_hash = hashlib.sha256(desc.encode("utf-8")).hexdigest()[:20]
-    PILOT_PHOTO_DIR = current_app.config["PILOT_PHOTO_DIR"]
-    frozen = current_app.config["FROZEN"]
-    img_path = os.path.join(PILOT_PHOTO_DIR, f"{pilot_hash}.png")
-    with open(img_path, "wb") as f:
-        f.write(img_bytes)
-    if frozen:
-        return {"path": f"/pilot_photos/{pilot_hash}.png"}
-    return {"path": f"/static/pilot_photos/{pilot_hash}.png"}
+    try:
+        img_bytes = photo_store.decode_data_url(img_data)
+        filename = photo_store.save_photo(
+            current_app.config["PILOT_PHOTO_DIR"], asset_index.pilot_photo_hash(desc), img_bytes
+        )
+    except photo_store.PhotoError as e:
+        return {"error": str(e)}, 400
+    asset_index.invalidate()
+    response_cache.clear()
+    return {"path": f"/pilot_photos/{filename}"}
 
 
 @api_bp.route("/api/pilots")
+@cached_response(all_sources=True)
 def api_pilots():
     DB_PATH = current_app.config["DB_PATH"]
-    STATIC_ROOT = current_app.config["STATIC_ROOT"]
+    if sources.multi_source(current_app.config):
+        return merged_roster()
     if not DB_PATH or not os.path.isfile(DB_PATH):
         clear_config()
         return jsonify({"error": "IL-2 not found. Please provide the correct game path."}), 400
 
-    conn = sqlite3.connect(DB_PATH)
-    try:
-        cur = conn.cursor()
-        cur.execute("SELECT id, playerId FROM career WHERE extends = -1")
-        roots = cur.fetchall()
-
-        country_map = {
-            101: "Soviet Union",
-            102: "Great Britain",
-            103: "United States of America",
-            201: "Germany"
-        }
+    conn = db.get_db(DB_PATH)
+    graph = career_graph.get_career_graph(conn, DB_PATH)
+    names = get_catalog()
+    return jsonify(roster.build_roster(conn, graph, names, request_locale(names)))
 
-        pilots = []
-        for root_id, player_id in roots:
-            career_chain = il2_core.collect_career_chain(conn, root_id)
-            tip_career_id = il2_core.find_chain_tip(conn, career_chain)
-            cur.execute("SELECT playerId FROM career WHERE id = ?", (tip_career_id,))
-            row = cur.fetchone()
-            if not row:
-                continue
-            tip_pilot_id = row[0]
-            cur.execute("SELECT description, squadronId FROM pilot WHERE id = ?", (tip_pilot_id,))
-            row = cur.fetchone()
-            if not row:
-                continue
-            desc, squadronId = row
-            name = il2_core.extract_fullname(desc)
-            country_id = il2_core.extract_country_id(desc)
-            country_name = country_map.get(country_id, "Unknown")
-            squadron_short = il2_core.get_squadron_shortname(
-                squadronId, conn, STATIC_ROOT
-            ) if squadronId else "Unknown"
-            pilots.append({
-                "desc": desc,
-                "display": name,
-                "country": country_name,
-                "squadron": squadron_short,
-                "pilot_id": tip_pilot_id,
-                "root_career_id": root_id
-            })
-        return jsonify(pilots)
-    finally:
-        conn.close()
 
+def merged_roster():
+    """The pilots of the game's cp.db and every archive, each entry tagged with its
+    source and a source-qualified key. Sources are read in parallel and each one's
+    roster is only rebuilt when that database changes."""
+    names = get_catalog()
+    locale = request_locale(names)
 
-@api_bp.route("/api/service_record")
-def api_service_record():
-    DB_PATH = current_app.config["DB_PATH"]
-    PILOT_PHOTO_DIR = current_app.config["PILOT_PHOTO_DIR"]
-    STATIC_ROOT = current_app.config["STATIC_ROOT"]
-    frozen = current_app.config["FROZEN"]
-    game_path = current_app.config.get("GAME_PATH")
-    if frozen:
+    def source_roster(source):
+        def build(conn):
+            graph = career_graph.get_career_graph(conn, source.path)
+            return roster.build_roster(conn, graph, names, locale)
+
+        pilots = sources.rosters.get(
+            source.path, locale, names, lambda: db.with_connection(source.path, build)
+        )
+        return [
+            dict(p, source=source.id, source_label=source.label,
+                 key=sources.pilot_key(source.id, p["desc"]))
+            for p in pilots
+        ]
+
+    parts = sources.map_sources(source_roster, sources.configured_sources(current_app.config))
+    return jsonify([p for part in parts for p in part])
+
+
+def charactersranks_dir():
+    """Where charactersranks are read from; also recorded in the app config."""
+    if current_app.config["FROZEN"]:
         CHARACTERSRANKS_DIR = os.path.join(
-            os.path.dirname(PILOT_PHOTO_DIR), "charactersranks"
+            os.path.dirname(current_app.config["PILOT_PHOTO_DIR"]), "charactersranks"
         )
     else:
-        CHARACTERSRANKS_DIR = os.path.join(STATIC_ROOT, "charactersranks")
+        CHARACTERSRANKS_DIR = os.path.join(current_app.config["STATIC_ROOT"], "charactersranks")
     current_app.config["CHARACTERSRANKS_DIR"] = CHARACTERSRANKS_DIR
+    return CHARACTERSRANKS_DIR
 
-    if not DB_PATH or not os.path.isfile(DB_PATH):
-        return jsonify({"error": "IL-2 not found. Please provide the correct game path."}), 400
 
-    desc = request.args.get("desc")
-    if not desc:
-        return jsonify({"error": "Missing desc"}), 400
-    conn = sqlite3.connect(DB_PATH)
+# --- Pilot sections, shared by the single endpoints and /api/pilot_dossier ---
+
+def service_record_section(conn, DB_PATH, pilot, names, locale):
+    """pilot_info/promotions/awards of a resolved pilot, or None if its latest pilot row is gone."""
+    assets = get_assets()
+
     cur = conn.cursor()
-    cur.execute("SELECT id FROM pilot WHERE description = ?", (desc,))
-    row = cur.fetchone()
-    if not row:
-        return jsonify({"error": "Pilot not found"}), 404
-    pilot_id = row[0]
-    cur.execute("SELECT id FROM career WHERE playerId = ?", (pilot_id,))
-    row = cur.fetchone()
-    if not row:
-        return jsonify({"error": "Career not found"}), 404
-    starting_career_id = row[0]
-    career_chain = il2_core.collect_career_chain(conn, starting_career_id)
-    pilot_ids = []
-    for cid in career_chain:
-        cur.execute("SELECT playerId FROM career WHERE id=?", (cid,))
-        prow = cur.fetchone()
-        if prow:
-            pilot_ids.append(prow[0])
-
-    tip_career_id = il2_core.find_chain_tip(conn, career_chain)
-    cur.execute("SELECT playerId FROM career WHERE id = ?", (tip_career_id,))
-    row = cur.fetchone()
-    if not row:
-        return jsonify({"error": "Career not found"}), 404
-    latest_pilot_id = row[0]
-    cur.execute("SELECT description, squadronId FROM pilot WHERE id = ?", (latest_pilot_id,))
+    pilot_ids = pilot.pilot_ids
+    latest_pilot_id = pilot.tip_pilot_id
+    cur.execute(
+        "SELECT p.description, p.squadronId, p.rankId, s.configId FROM pilot p "
+        "LEFT JOIN squadron s ON s.id = p.squadronId WHERE p.id = ?",
+        (latest_pilot_id,)
+    )
     row = cur.fetchone()
     if not row:
-        return jsonify({"error": "Pilot not found"}), 404
-    desc, squadron_id = row
+        return None
+    desc, squadron_id, current_rank_id, config_id = row
     name = il2_core.extract_fullname(desc)
     name_parts = name.split(' ', 1)
     first_name = name_parts[0]
     last_name = name_parts[1] if len(name_parts) > 1 else ""
     birthdate = il2_core.extract_birthdate(desc)
     country_id = il2_core.extract_country_id(desc)
-    country_map = {
-        101: "Soviet Union",
-        102: "Great Britain",
-        103: "United States of America",
-        201: "Germany"
-    }
-    country_name = country_map.get(country_id, "Unknown")
-    squadron_short = il2_core.get_squadron_shortname(
-        squadron_id, conn, STATIC_ROOT
-    ) if squadron_id else "Unknown"
-
-    cur.execute("SELECT rankId FROM pilot WHERE id = ?", (latest_pilot_id,))
-    rank_row = cur.fetchone()
-    if rank_row:
-        current_rank_id = rank_row[0]
-        rank_name = il2_core.get_rank_name(
-            country_id, current_rank_id, STATIC_ROOT, game_path, CHARACTERSRANKS_DIR
-        )
+    country_name = il2_core.COUNTRY_NAMES.get(country_id, "Unknown")
+    squadron_short = names.squadron_name(config_id, locale) if squadron_id else "Unknown"
+    rank_name = names.rank_name(country_id, current_rank_id, locale)
+
+    if sidecar.attach(conn, DB_PATH):
+        # Index seek on the chain's event list instead of scanning event
+        cur.execute(f"""
+            SELECT e.date, e.type, e.rankId, e.tpar2, e.squadronId
+            FROM {sidecar.ALIAS}.chain_event ce CROSS JOIN event e ON e.rowid = ce.event_rowid
+            WHERE ce.chain_id = ? AND ce.type IN (6,8)
+            ORDER BY ce.date ASC, ce.event_rowid ASC
+        """, (pilot.tip_career_id,))
     else:
-        current_rank_id = None
-        rank_name = "Unknown"
-
-    ids_qs = ",".join(str(i) for i in pilot_ids)
-    query = f"""SELECT date, type, rankId, tpar2, squadronId FROM event WHERE type IN (6,8) AND pilotId IN ({ids_qs}) ORDER BY date ASC"""
-    cur.execute(query)
+        ids_qs = ",".join(str(i) for i in pilot_ids)
+        query = f"""SELECT date, type, rankId, tpar2, squadronId FROM event WHERE type IN (6,8) AND pilotId IN ({ids_qs}) ORDER BY date ASC"""
+        cur.execute(query)
     promotions, awards = [], []
     for date, etype, rank_id, tpar2, squadron_id in cur.fetchall():
         d = date.split()[0] if date else ""
@@ -236,22 +259,18 @@ def api_service_record():
             dt_formatted = d
             date_for_check = d
         if etype == 6:
-            rname = il2_core.get_rank_name(
-                country_id, rank_id, STATIC_ROOT, game_path, CHARACTERSRANKS_DIR
-            )
-            rimg = il2_core.get_rank_image_path(
-                country_id, rank_id, date_for_check, STATIC_ROOT, CHARACTERSRANKS_DIR
-                
-            )
+            rname = names.rank_name(country_id, rank_id, locale)
+            rimg = assets.rank_image(country_id, rank_id, date_for_check)
             promotions.append({"desc": rname, "date": dt_formatted, "img": rimg})
         elif etype == 8:
-            aname = il2_core.get_award_name_static(tpar2, STATIC_ROOT)
+            aname = names.award_name(tpar2, locale)
             if "rubles" in aname.lower():
                 continue
-            awards.append({"desc": aname, "date": dt_formatted, "tpar2": tpar2})
+            awards.append({"desc": aname, "date": dt_formatted, "tpar2": tpar2,
+                           "img": assets.award_image(tpar2)})
 
-    photo_url = il2_core.get_photo_path_for_desc(desc, PILOT_PHOTO_DIR, frozen)
-    return jsonify({
+    photo_url = assets.photo_url(desc)
+    return {
         "pilot_info": {
             "full_name": name,
             "first_name": first_name,
@@ -265,272 +284,363 @@ def api_service_record():
         },
         "promotions": promotions,
         "awards": awards
-    })
+    }
+
+
+def pilot_stats_section(conn, DB_PATH, pilot):
+    """Labelled statistics of a resolved pilot in display order, or None if its row is gone."""
+    # Labels, skip list and display order come precomputed with the schema
+    projection = schema_registry.get_schema(conn, DB_PATH).stats
+    cur = conn.cursor()
+    cur.execute(projection.sql, (pilot.tip_pilot_id,))
+    pilot_row = cur.fetchone()
+    if not pilot_row:
+        return None
+    return projection.render(pilot_row)
+
+
+MAX_SORTIE_PAGE = 1000
+SORTIE_FETCH_SIZE = 256
+SORTIE_BUCKETS = list(sortie_buckets.KILL_BUCKETS)
+
+
+def encode_sortie_cursor(date, rowid):
+    raw = json.dumps([date, rowid]).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii")
+
+
+def decode_sortie_cursor(cursor):
+    """(date, rowid) from an opaque ?cursor=, or None; raises ValueError if malformed."""
+    if not cursor:
+        return None
+    try:
+        date, rowid = json.loads(base64.urlsafe_b64decode(cursor.encode("ascii")))
+    except Exception:
+        raise ValueError("Invalid cursor")
+    # date is NULL for a sortie the game saved without one
+    if not isinstance(rowid, int) or isinstance(rowid, bool):
+        raise ValueError("Invalid cursor")
+    if date is not None and not isinstance(date, str):
+        raise ValueError("Invalid cursor")
+    return date, rowid
+
+
+def sortie_page_args():
+    """(limit, after) from ?limit= and ?cursor=; raises ValueError if malformed."""
+    limit = int(request.args["limit"]) if "limit" in request.args else None
+    after = decode_sortie_cursor(request.args.get("cursor"))
+    if limit is not None:
+        limit = max(1, min(limit, MAX_SORTIE_PAGE))
+    return limit, after
+
+
+def query_sorties(conn, DB_PATH, pilot, limit=None, after=None):
+    """A cursor over the pilot's sortie rows in logbook order, or None if there are none."""
+    pilot_ids = list(pilot.pilot_ids)
+    if not pilot_ids:
+        return None
+
+    # Kill buckets are summed inside SQLite, over the columns this schema has
+    schema = schema_registry.get_schema(conn, DB_PATH)
+    select_fields = (
+        ["s.rowid", "s.date", "s.model", "m.mTemplate"] +
+        schema.sortie_bucket_select + ["s.flightTime"]
+    )
+
+    if sidecar.attach(conn, DB_PATH):
+        # Walk the chain's (date, rowid)-ordered sortie list; no scan, no sort
+        source = f"{sidecar.ALIAS}.chain_sortie cs CROSS JOIN sortie s ON s.rowid = cs.sortie_rowid"
+        where = "cs.chain_id = ?"
+        params = [pilot.tip_career_id]
+        date_col, rowid_col = "cs.date", "cs.sortie_rowid"
+    else:
+        source = "sortie s"
+        where = f"s.pilotId IN ({','.join(['?'] * len(pilot_ids))})"
+        params = list(pilot_ids)
+        date_col, rowid_col = "s.date", "s.rowid"
+    keyset = ""
+    if after:
+        # Keyset pagination: resume strictly after the (date, rowid) of the last row sent
+        keyset = f"AND ({date_col} > ? OR ({date_col} = ? AND {rowid_col} > ?))"
+        params += [after[0], after[0], after[1]]
+    query = f"""
+        SELECT {', '.join(select_fields)}
+        FROM {source}
+        LEFT JOIN mission m ON m.id = s.missionId
+        WHERE {where} {keyset}
+        ORDER BY {date_col} ASC, {rowid_col} ASC
+    """
+    if limit is not None:
+        query += " LIMIT ?"
+        params.append(limit)
+
+    cur = conn.cursor()
+    try:
+        cur.execute(query, params)
+    except sqlite3.OperationalError as e:
+        current_app.logger.warning("Sorties query failed: %s", e)
+        return None
+    return cur
+
+
+def build_sortie(row):
+    idx = 1
+    date = row[idx]; idx += 1
+    raw_model = row[idx]; idx += 1
+    template = row[idx]; idx += 1
+
+    bucket_vals = row[idx: idx + len(SORTIE_BUCKETS)]
+    idx += len(SORTIE_BUCKETS)
+
+    flight_time = row[idx] if idx < len(row) else None
+
+    # Build sortie dict with separate kill fields
+    sortie = {
+        "date": date,
+        "aircraft": il2_core.extract_plane_name(raw_model),
+        "mission_type": il2_core.normalize_mtemplate(template),
+    }
+    sortie.update(zip(SORTIE_BUCKETS, bucket_vals))
+
+    # Flight time formatting
+    if flight_time is not None:
+        hours = int(flight_time // 3600)
+        minutes = int((flight_time % 3600) // 60)
+        if hours > 0 and minutes > 0:
+            sortie["flight_time"] = f"{hours}h {minutes}m"
+        elif hours > 0:
+            sortie["flight_time"] = f"{hours}h"
+        else:
+            sortie["flight_time"] = f"{minutes}m"
+    else:
+        sortie["flight_time"] = ""
+    return sortie
+
+
+def sortie_log_section(conn, DB_PATH, pilot, limit=None, after=None):
+    """The whole logbook as a list, or one {"sorties", "next_cursor"} page when limit is set."""
+    cur = query_sorties(conn, DB_PATH, pilot, limit, after)
+    rows = cur.fetchall() if cur is not None else []
+    sorties = [build_sortie(row) for row in rows]
+    if limit is None:
+        return sorties
+
+    next_cursor = None
+    if len(rows) == limit:
+        last = rows[-1]
+        next_cursor = encode_sortie_cursor(last[1], last[0])
+    return {"sorties": sorties, "next_cursor": next_cursor}
+
+
+@api_bp.route("/api/service_record")
+@cached_response
+def api_service_record():
+    DB_PATH = request_db_path()
+    if not DB_PATH or not os.path.isfile(DB_PATH):
+        return jsonify({"error": "IL-2 not found. Please provide the correct game path."}), 400
+
+    desc = request.args.get("desc")
+    if not desc:
+        return jsonify({"error": "Missing desc"}), 400
+    conn = db.get_db(DB_PATH)
+    pilot = pilot_index.resolve_pilot(conn, DB_PATH, desc)
+    if pilot is None:
+        return jsonify({"error": "Pilot not found"}), 404
+    if pilot.tip_pilot_id is None:
+        return jsonify({"error": "Career not found"}), 404
+    names = get_catalog()
+    record = service_record_section(conn, DB_PATH, pilot, names, request_locale(names))
+    if record is None:
+        return jsonify({"error": "Pilot not found"}), 404
+    return jsonify(record)
 
 
 @api_bp.route("/api/pilot_stats")
+@cached_response
 def api_pilot_stats():
-    DB_PATH = current_app.config["DB_PATH"]
+    DB_PATH = request_db_path()
     if not DB_PATH or not os.path.isfile(DB_PATH):
         return jsonify({"error": "IL-2 not found. Please provide the correct game path."}), 400
 
     desc = request.args.get('desc')
     if not desc:
         return jsonify({"error": "Missing desc"}), 400
-    conn = sqlite3.connect(DB_PATH)
-    cur = conn.cursor()
-    cur.execute("SELECT id FROM pilot WHERE description = ?", (desc,))
-    row = cur.fetchone()
-    if not row:
+    conn = db.get_db(DB_PATH)
+    pilot = pilot_index.resolve_pilot(conn, DB_PATH, desc)
+    if pilot is None:
         return jsonify({"error": "Pilot not found"}), 404
-    pilot_id = row[0]
-    cur.execute("SELECT id FROM career WHERE playerId = ?", (pilot_id,))
-    row = cur.fetchone()
-    if not row:
+    if pilot.tip_pilot_id is None:
         return jsonify({"error": "Career not found"}), 404
-    starting_career_id = row[0]
-    career_chain = il2_core.collect_career_chain(conn, starting_career_id)
-    tip_career_id = il2_core.find_chain_tip(conn, career_chain)
-    cur.execute("SELECT playerId FROM career WHERE id = ?", (tip_career_id,))
-    row = cur.fetchone()
-    if not row:
-        return jsonify({"error": "Career not found"}), 404
-    latest_pilot_id = row[0]
-    cur.execute("PRAGMA table_info(pilot)")
-    columns = [row[1] for row in cur.fetchall()]
-    cur.execute(f"SELECT * FROM pilot WHERE id = ?", (latest_pilot_id,))
-    pilot_row = cur.fetchone()
-    stats = dict(zip(columns, pilot_row))
-
-    # Your field skip list as before
-    skip_fields = {
-        'description', 'id', 'name', 'lastName', 'personageId', 'avatarPath', 'birthDay',
-        'isDeleted', 'penalty', 'penaltyPot', 'pcp', 'squadronId', 'rankId', 'state',
-        'stateDate', 'statePeriod', 'trainPot', 'vehPot', 'shipPot', 'buildingPot', 'score',
-        'transferProb', 'wounded', 'nickname', 'deathDate', 'bioInfo', 'startDate',
-        'playerCountryId', 'startSquadronInfo', 'virtualSquadronId', 'playerPremiumStatus',
-        'startRankInfo', 'careerStartDate', 'insDate', 'killLightPlane', 'killMediumPlane',
-        'killHeavyPlane', 'sorties', 'goodSorties', 'success_rate'
-    }
-
-    def friendly_label(field):
-        if field.lower().startswith('kill'):
-            field = field[4:]
-        field = re.sub(r'([A-Z]{2,})([A-Z][a-z])', r'\1 \2', field)
-        field = re.sub(r'(?<=[a-z])([A-Z])', r' \1', field)
-        words = field.split()
-        new_words = [w if w.isupper() and len(w) > 1 else w.capitalize() for w in words]
-        return ' '.join(new_words)
-
-    # Build mapping from display label to value (skipping skip_fields)
-    label_value_map = {}
-    for col in columns:
-        if col in skip_fields:
-            continue
-        val = stats.get(col)
-        if val is None or (isinstance(val, (int, float)) and val == 0):
-            continue
-        label = friendly_label(col)
-        label_value_map[label] = val
-
-    # Always show these 3 at the top, exactly as in your display order
-    output = OrderedDict()
-    # Flight Time (special formatting)
-    if 'flightTime' in stats and stats.get('flightTime'):
-        t = stats['flightTime']
-        output["Flight Time"] = f"{int((t // 3600))}h {int((t % 3600) // 60)}m"
-    # Good Sorties
-    output["Good Sorties"] = stats.get('goodSorties', 0)
-    # Sorties
-    output["Sorties"] = stats.get('sorties', 0)
-    # Success Rate
-    sorties = stats.get('sorties') or 0
-    good = stats.get('goodSorties') or 0
-    output["Success Rate"] = f"{(good / sorties * 100):.1f}%" if sorties else "0.0%"
-
-    # Use your *display order* (friendly_label form) and fill from label_value_map
-    for label in stat_order_labels:
-        if label in output:
-            continue  # already added above
-        if label in label_value_map:
-            output[label] = label_value_map[label]
-
-    # (Optional) Add any remaining items (shouldn't be needed, but for completeness)
-    for label in label_value_map:
-        if label not in output:
-            output[label] = label_value_map[label]
+    output = pilot_stats_section(conn, DB_PATH, pilot)
+    if output is None:
+        return jsonify({"error": "Pilot not found"}), 404
 
     return Response(
         json.dumps(output, ensure_ascii=False, sort_keys=False),
         mimetype="application/json"
     )
 
+
 @api_bp.route("/api/pilot_sorties")
+@cached_response
 def api_pilot_sorties():
-    DB_PATH = current_app.config["DB_PATH"]
+    DB_PATH = request_db_path()
+    if not DB_PATH or not os.path.isfile(DB_PATH):
+        return jsonify({"error": "IL-2 not found. Please provide the correct game path."}), 400
+
     desc = request.args.get("desc")
     if not desc:
         return jsonify({"error": "Missing desc"}), 400
 
-    conn = sqlite3.connect(DB_PATH)
-    conn.row_factory = sqlite3.Row
-    cur = conn.cursor()
+    try:
+        limit, after = sortie_page_args()
+    except ValueError:
+        return jsonify({"error": "Invalid limit or cursor"}), 400
+
+    conn = db.get_db(DB_PATH)
 
     # Pilot + career resolution
-    cur.execute("SELECT id FROM pilot WHERE description = ?", (desc,))
-    row = cur.fetchone()
-    if not row:
+    pilot = pilot_index.resolve_pilot(conn, DB_PATH, desc)
+    if pilot is None:
         return jsonify({"error": "Pilot not found"}), 404
-    pilot_id = row["id"] if "id" in row.keys() else row[0]
-
-    cur.execute("SELECT id FROM career WHERE playerId = ?", (pilot_id,))
-    row = cur.fetchone()
-    if not row:
+    if pilot.career_id is None:
         return jsonify({"error": "Career not found"}), 404
-    root_career_id = row["id"] if "id" in row.keys() else row[0]
 
-    career_chain = il2_core.collect_career_chain(conn, root_career_id)
-    pilot_ids = []
-    for cid in career_chain:
-        cur.execute("SELECT playerId FROM career WHERE id = ?", (cid,))
-        prow = cur.fetchone()
-        if prow:
-            pilot_ids.append(prow["playerId"] if "playerId" in prow.keys() else prow[0])
+    if request.args.get("format") != "ndjson":
+        return jsonify(sortie_log_section(conn, DB_PATH, pilot, limit, after))
 
-    if not pilot_ids:
-        return jsonify([])
-
-    # Inspect schema for sortie table
-    cur.execute("PRAGMA table_info(sortie);")
-    cols_info = cur.fetchall()
-    col_names = [c[1] for c in cols_info]
-
-    def exists(cols):
-        return [c for c in cols if c in col_names]
-
-    air_kill_cols = exists(["killLightPlane", "killMediumPlane", "killHeavyPlane"])
-    ground_kill_cols = exists([
-        'killHeavyTank', 'killMediumTank', 'killVehicle', 'killLightTank', 'killArmouredVehicle',
-        'killTruck', 'killCar'
-    ])
-    artillery_kills_cols = exists([
-        'killHowitzer', 'killFieldGun', 'killNavalGun', 'killRocketLauncher',
-        'killHeavyFlak', 'killLightFlak', 'killAAAMachineGun'
-    ])
-    naval_kill_cols = exists(['killLightShip', 'killDestroyerShip', 'killSubmarine', 'killLargeCargoShip'])
-    railway_kills_cols = exists(['killTrainLocomotive', 'killTrainVagon'])
-    structure_kills_cols = exists([
-        'killRuralYard', 'killTownBuilding', 'killFactoryBuilding',
-        'killRailwayStationFacility', 'killBridge', 'killAirfieldFacility'
-    ])
-
-    bucket_columns = (
-        air_kill_cols + ground_kill_cols + naval_kill_cols +
-        artillery_kills_cols + railway_kills_cols + structure_kills_cols
-    )
+    cur = query_sorties(conn, DB_PATH, pilot, limit, after)
+    if cur is None:
+        return Response("", mimetype="application/x-ndjson")
 
-    select_fields = ["date", "model", "missionId"] + bucket_columns + ["flightTime"]
+    # One sortie per line, read off the cursor in batches; memory stays flat
+    def generate():
+        while True:
+            rows = cur.fetchmany(SORTIE_FETCH_SIZE)
+            if not rows:
+                break
+            for row in rows:
+                yield json.dumps(build_sortie(row), ensure_ascii=False) + "\n"
+    return Response(stream_with_context(generate()), mimetype="application/x-ndjson")
 
-    qmarks = ",".join(["?"] * len(pilot_ids))
-    query = f"""
-        SELECT {', '.join(select_fields)}
-        FROM sortie
-        WHERE pilotId IN ({qmarks})
-        ORDER BY date ASC
-    """
 
-    try:
-        cur.execute(query, pilot_ids)
-    except sqlite3.OperationalError as e:
-        current_app.logger.warning("Sorties query failed: %s", e)
-        return jsonify([])
-
-    def extract_plane_name(raw_model: str) -> str:
-        if not raw_model:
-            return ""
-        try:
-            base = raw_model.split("/")[-1]
-            name = base.replace(".txt", "")
-            return name.upper()
-        except Exception:
-            return raw_model.upper()
-
-    def normalize_mtemplate(template: str) -> str:
-        if not template:
-            return ""
-        if '@' in template:
-            template = template.split('@', 1)[0]
-        else:
-            idx = template.find('_p0')
-            if idx != -1:
-                template = template[:idx]
-        template = template.replace('-', ' ').replace('_', ' ').strip()
-        return " ".join(word.capitalize() for word in template.split())
-
-    sorties = []
-    for row in cur.fetchall():
-        idx = 0
-        date = row[idx]; idx += 1
-        raw_model = row[idx]; idx += 1
-        mission_id = row[idx]; idx += 1
-
-        bucket_vals = row[idx: idx + len(bucket_columns)]
-        bucket_map = dict(zip(bucket_columns, bucket_vals))
-        idx += len(bucket_columns)
-
-        flight_time = row[idx] if idx < len(row) else None
-
-        # Aggregate kills
-        air_kills = sum(bucket_map.get(c, 0) or 0 for c in air_kill_cols)
-        ground_kills = sum(bucket_map.get(c, 0) or 0 for c in ground_kill_cols)
-        naval_kills = sum(bucket_map.get(c, 0) or 0 for c in naval_kill_cols)
-        artillery_kills = sum(bucket_map.get(c, 0) or 0 for c in artillery_kills_cols)
-        railway_kills = sum(bucket_map.get(c, 0) or 0 for c in railway_kills_cols)
-        structure_kills = sum(bucket_map.get(c, 0) or 0 for c in structure_kills_cols)
-
-        # Mission type normalization
-        mission_type = ""
-        if mission_id is not None:
-            cur.execute("SELECT mTemplate FROM mission WHERE id = ?", (mission_id,))
-            mrow = cur.fetchone()
-            if mrow:
-                template = mrow["mTemplate"] if "mTemplate" in mrow.keys() else mrow[0]
-                mission_type = normalize_mtemplate(template)
-
-        # Build sortie dict with separate kill fields
-        sortie = {
-            "date": date,
-            "aircraft": extract_plane_name(raw_model),
-            "mission_type": mission_type,
-            "air_kills": air_kills,
-            "ground_kills": ground_kills,
-            "naval_kills": naval_kills,
-            "artillery_kills": artillery_kills,
-            "railway_kills": railway_kills,
-            "structure_kills": structure_kills,
-        }
+DOSSIER_SECTIONS = ("record", "stats", "sorties")
 
-        # Flight time formatting
-        if flight_time is not None:
-            hours = int(flight_time // 3600)
-            minutes = int((flight_time % 3600) // 60)
-            if hours > 0 and minutes > 0:
-                sortie["flight_time"] = f"{hours}h {minutes}m"
-            elif hours > 0:
-                sortie["flight_time"] = f"{hours}h"
-            else:
-                sortie["flight_time"] = f"{minutes}m"
-        else:
-            sortie["flight_time"] = ""
 
-        sorties.append(sortie)
+@api_bp.route("/api/pilot_dossier")
+@cached_response
+def api_pilot_dossier():
+    """record/stats/sorties of one pilot in a single response (?sections= picks a subset)."""
+    DB_PATH = request_db_path()
+    if not DB_PATH or not os.path.isfile(DB_PATH):
+        return jsonify({"error": "IL-2 not found. Please provide the correct game path."}), 400
 
-    return jsonify(sorties)
+    desc = request.args.get("desc")
+    if not desc:
+        return jsonify({"error": "Missing desc"}), 400
+    requested = request.args.get("sections")
+    sections = [s.strip() for s in requested.split(",") if s.strip()] if requested else DOSSIER_SECTIONS
+    unknown = [s for s in sections if s not in DOSSIER_SECTIONS]
+    if unknown:
+        return jsonify({"error": f"Unknown section: {', '.join(unknown)}"}), 400
+    try:
+        limit, after = sortie_page_args()
+    except ValueError:
+        return jsonify({"error": "Invalid limit or cursor"}), 400
+
+    # Resolved once; every section reads the same chain over the same connection
+    conn = db.get_db(DB_PATH)
+    pilot = pilot_index.resolve_pilot(conn, DB_PATH, desc)
+    if pilot is None:
+        return jsonify({"error": "Pilot not found"}), 404
+    if pilot.career_id is None or pilot.tip_pilot_id is None:
+        return jsonify({"error": "Career not found"}), 404
 
+    dossier = OrderedDict()
+    if "record" in sections:
+        names = get_catalog()
+        dossier["record"] = service_record_section(conn, DB_PATH, pilot, names, request_locale(names))
+        if dossier["record"] is None:
+            return jsonify({"error": "Pilot not found"}), 404
+    if "stats" in sections:
+        dossier["stats"] = pilot_stats_section(conn, DB_PATH, pilot)
+        if dossier["stats"] is None:
+            return jsonify({"error": "Pilot not found"}), 404
+    if "sorties" in sections:
+        dossier["sorties"] = sortie_log_section(conn, DB_PATH, pilot, limit, after)
+
+    # json.dumps rather than jsonify: the stats section keeps its display order
+    return Response(
+        json.dumps(dossier, ensure_ascii=False, sort_keys=False),
+        mimetype="application/json"
+    )
 
 
+@api_bp.route("/api/pilot_sortie_summary")
+@cached_response
+def api_pilot_sortie_summary():
+    DB_PATH = request_db_path()
+    if not DB_PATH or not os.path.isfile(DB_PATH):
+        return jsonify({"error": "IL-2 not found. Please provide the correct game path."}), 400
 
+    desc = request.args.get("desc")
+    if not desc:
+        return jsonify({"error": "Missing desc"}), 400
 
+    conn = db.get_db(DB_PATH)
+    cur = conn.cursor()
+    pilot = pilot_index.resolve_pilot(conn, DB_PATH, desc)
+    if pilot is None:
+        return jsonify({"error": "Pilot not found"}), 404
+    if pilot.career_id is None:
+        return jsonify({"error": "Career not found"}), 404
+    pilot_ids = list(pilot.pilot_ids)
+
+    bucket_names = list(sortie_buckets.KILL_BUCKETS)
+    sums = ", ".join(schema_registry.get_schema(conn, DB_PATH).sortie_bucket_sums)
+    if sidecar.attach(conn, DB_PATH):
+        # The chain's own sortie list, as in query_sorties; no scan of sortie
+        source = f"{sidecar.ALIAS}.chain_sortie cs CROSS JOIN sortie s ON s.rowid = cs.sortie_rowid"
+        where = "cs.chain_id = ?"
+        params = [pilot.tip_career_id]
+    else:
+        source = "sortie s"
+        where = f"s.pilotId IN ({','.join(['?'] * len(pilot_ids))})"
+        params = pilot_ids
+
+    def grouped(key_expr):
+        cur.execute(f"""
+            SELECT {key_expr}, COUNT(*), IFNULL(SUM(s.flightTime), 0), {sums}
+            FROM {source}
+            WHERE {where}
+            GROUP BY 1
+            ORDER BY 1
+        """, params)
+        for key, count, flight_time, *totals in cur.fetchall():
+            entry = {"sorties": count, "flight_time_seconds": flight_time}
+            entry.update(zip(bucket_names, (t or 0 for t in totals)))
+            yield key, entry
+
+    def merge(into, entry):
+        for field, value in entry.items():
+            into[field] = into.get(field, 0) + value
+
+    totals = {}
+    by_month = []
+    for month, entry in grouped("substr(s.date, 1, 7)"):
+        merge(totals, entry)
+        by_month.append(dict(month=month, **entry))
+
+    # Several model paths can map to the same aircraft name
+    by_aircraft = OrderedDict()
+    for model, entry in grouped("s.model"):
+        merge(by_aircraft.setdefault(il2_core.extract_plane_name(model), {}), entry)
+
+    return jsonify({
+        "totals": totals,
+        "by_aircraft": [dict(aircraft=name, **entry) for name, entry in by_aircraft.items()],
+        "by_month": by_month,
+    })
 
 
 # --- API: Ping to keep server alive (for auto-exit) ---
@@ -539,16 +649,51 @@ last_ping = [time.time()]
 @api_bp.route('/api/ping', methods=['POST'])
 def ping():
     last_ping[0] = time.time()
-    print("Ping received at", time.strftime("%H:%M:%S"))
     return {'ok': True}
 
 
+# --- API: Server-sent events ---
+# The page keeps this stream open: it is the liveness signal ping_monitor watches,
+# and "career" events ({"pilots": [desc, ...], "roster": bool, "all": bool}) say
+# whose data changed after the game wrote to cp.db.
+@api_bp.route('/api/events')
+def api_events():
+    if events.broker.closed:
+        return jsonify({"error": "Shutting down"}), 503
+    if events.broker.full():
+        # Keeps streams from taking every server thread; the page retries later
+        response = jsonify({"error": "Too many event streams"})
+        response.headers["Retry-After"] = "30"
+        return response, 503
+    response = Response(events.broker.stream(), mimetype="text/event-stream")
+    response.cache_control.no_cache = True
+    response.headers["X-Accel-Buffering"] = "no"
+    return response
+
+
+# --- API: Metrics (latency histograms, SQL/file probe counts, cache hit rates) ---
+# Any API request also takes ?profile=1 to get a cProfile summary instead of its body
+MEMOIZED_FUNCTIONS = [
+    il2_core.extract_plane_name, il2_core.normalize_mtemplate,
+    asset_index.rank_image_name, asset_index.pilot_photo_hash,
+]
+
+
+@api_bp.route('/api/metrics')
+def api_metrics():
+    report = metrics.snapshot()
+    caches = {"response_cache": (response_cache.hits, response_cache.misses)}
+    caches.update(db.cache_stats())
+    for fn in MEMOIZED_FUNCTIONS:
+        info = fn.cache_info()
+        caches[fn.__name__] = (info.hits, info.misses)
+    report["caches"] = {name: metrics.hit_rate(*counts) for name, counts in caches.items()}
+    return jsonify(report)
+
+
 # --- API: Shutdown server ---
 @api_bp.route('/shutdown', methods=['POST'])
 def shutdown():
-    shutdown_func = request.environ.get('werkzeug.server.shutdown')
-    if shutdown_func:
-        shutdown_func()
-    else:
-        os.kill(os.getpid(), signal.SIGTERM)
+    # Graceful: in-flight requests (this one included) finish before the process exits
+    server.shutdown_in_background("Shutdown requested.")
     return 'Server shutting down...'
@@ -0,0 +1,137 @@
+import re
+from collections import OrderedDict
+import db
+import sortie_buckets
+
+TABLES = ("pilot", "sortie", "event", "career", "mission", "squadron")
+
+# Use your *display order* in friendly_label form
+STAT_ORDER_LABELS = [
+    "Flight Time", "Good Sorties", "Sorties", "Success Rate",
+    "Light Fighter", "Light Attack Plane", "Light Bomber", "Light Recon", "Light Transport",
+    "Medium Fighter", "Medium Attack Plane", "Medium Bomber", "Medium Recon", "Medium Transport",
+    "Heavy Fighter", "Heavy Attack Plane", "Heavy Bomber", "Heavy Recon", "Heavy Transport",
+    "Heavy Armoured", "Heavy Tank", "Medium Tank", "Vehicle", "Light Tank", "Armoured Vehicle",
+    "Truck", "Car", "Train Locomotive", "Train Vagon", "Howitzer", "Field Gun",
+    "Naval Gun", "Rocket Launcher", "Machine Gun", "Searchlight", "Static Plane",
+    "Air Defence", "Heavy Flak", "Light Flak", "AAA Machine Gun", "Ships",
+    "Light Ship", "Destroyer Ship", "Submarine", "Large Cargo Ship", "Building",
+    "Rural Yard", "Town Building", "Factory Building", "Railway Station Facility", "Bridge",
+    "Airfield Facility", "Air Crew", "Pilot", "Plane Gunner", "Driver", "Vehicle Gunner",
+    "Infantry", "Turrets", "Plane Turrets", "Vehicle Turrets", "Plane In Group", "Assist"
+]
+
+# pilot columns that are never shown as statistics
+STAT_SKIP_FIELDS = {
+    'description', 'id', 'name', 'lastName', 'personageId', 'avatarPath', 'birthDay',
+    'isDeleted', 'penalty', 'penaltyPot', 'pcp', 'squadronId', 'rankId', 'state',
+    'stateDate', 'statePeriod', 'trainPot', 'vehPot', 'shipPot', 'buildingPot', 'score',
+    'transferProb', 'wounded', 'nickname', 'deathDate', 'bioInfo', 'startDate',
+    'playerCountryId', 'startSquadronInfo', 'virtualSquadronId', 'playerPremiumStatus',
+    'startRankInfo', 'careerStartDate', 'insDate', 'killLightPlane', 'killMediumPlane',
+    'killHeavyPlane', 'sorties', 'goodSorties', 'success_rate'
+}
+
+# Always shown first, computed from these columns rather than listed as-is
+STAT_HEADER_COLUMNS = ("flightTime", "goodSorties", "sorties")
+STAT_HEADER_LABELS = {"Flight Time", "Good Sorties", "Sorties", "Success Rate"}
+
+
+def friendly_label(field):
+    if field.lower().startswith('kill'):
+        field = field[4:]
+    field = re.sub(r'([A-Z]{2,})([A-Z][a-z])', r'\1 \2', field)
+    field = re.sub(r'(?<=[a-z])([A-Z])', r' \1', field)
+    words = field.split()
+    new_words = [w if w.isupper() and len(w) > 1 else w.capitalize() for w in words]
+    return ' '.join(new_words)
+
+
+class StatsProjection:
+    """The pilot columns /api/pilot_stats shows, already labelled and in display order."""
+
+    def __init__(self, pilot_columns):
+        self.header_columns = [c for c in STAT_HEADER_COLUMNS if c in pilot_columns]
+
+        # label -> columns carrying it, in first-seen column order
+        by_label = OrderedDict()
+        for col in pilot_columns:
+            if col in STAT_SKIP_FIELDS:
+                continue
+            label = friendly_label(col)
+            if label in STAT_HEADER_LABELS:
+                continue
+            by_label.setdefault(label, []).append(col)
+        ordered = [label for label in STAT_ORDER_LABELS if label in by_label]
+        ordered += [label for label in by_label if label not in ordered]
+
+        self.columns = list(self.header_columns)
+        self.fields = []  # (label, [positions in the selected row])
+        for label in ordered:
+            positions = []
+            for col in by_label[label]:
+                positions.append(len(self.columns))
+                self.columns.append(col)
+            self.fields.append((label, positions))
+        select_list = ", ".join(f'"{c}"' for c in self.columns) or "id"
+        self.sql = f"SELECT {select_list} FROM pilot WHERE id = ?"
+
+    def render(self, row):
+        header = dict(zip(self.header_columns, row))
+        output = OrderedDict()
+        # Flight Time (special formatting)
+        t = header.get('flightTime')
+        if t:
+            output["Flight Time"] = f"{int((t // 3600))}h {int((t % 3600) // 60)}m"
+        output["Good Sorties"] = header.get('goodSorties', 0)
+        output["Sorties"] = header.get('sorties', 0)
+        sorties = header.get('sorties') or 0
+        good = header.get('goodSorties') or 0
+        output["Success Rate"] = f"{(good / sorties * 100):.1f}%" if sorties else "0.0%"
+
+        for label, positions in self.fields:
+            # Zero and NULL values are left out; the last non-empty column wins a shared label
+            value = None
+            for pos in positions:
+                val = row[pos]
+                if val is None or (isinstance(val, (int, float)) and val == 0):
+                    continue
+                value = val
+            if value is not None:
+                output[label] = value
+        return output
+
+
+class Schema:
+    """Column lists of the cp.db tables the app reads, plus projections derived from them."""
+
+    def __init__(self, columns):
+        self.columns = columns
+        self._column_sets = {table: set(cols) for table, cols in columns.items()}
+        self.stats = StatsProjection(columns.get("pilot", []))
+        sortie_columns = columns.get("sortie", [])
+        self.sortie_bucket_select = sortie_buckets.bucket_select(sortie_columns)
+        self.sortie_bucket_sums = sortie_buckets.bucket_sum_select(sortie_columns)
+
+    def table_columns(self, table):
+        return self.columns.get(table, [])
+
+    def has_column(self, table, column):
+        return column in self._column_sets.get(table, ())
+
+
+def table_columns(conn, table):
+    cur = conn.cursor()
+    cur.execute(f"PRAGMA table_info({table})")
+    return [row[1] for row in cur.fetchall()]
+
+
+def build_schema(conn):
+    return Schema({table: table_columns(conn, table) for table in TABLES})
+
+
+_schemas = db.VersionedCache(lambda conn, db_path: build_schema(conn), name="schema")
+
+
+def get_schema(conn, db_path):
+    return _schemas.get(conn, db_path)
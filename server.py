@@ -0,0 +1,107 @@
+import os
+import threading
+from werkzeug.wrappers import Response
+from werkzeug.wsgi import ClosingIterator
+import db
+import events
+
+try:
+    # Optional: the production server; without it the development server is used
+    import waitress
+except ImportError:
+    waitress = None
+
+HOST = "127.0.0.1"
+PORT = 5000
+
+# ---- Serving mode: IL2_PASSPORT_SERVER=waitress for a multi-threaded production server ----
+SERVER_MODE = os.environ.get("IL2_PASSPORT_SERVER", "dev")
+THREADS = int(os.environ.get("IL2_PASSPORT_THREADS", "8"))
+# Seconds an idle keep-alive connection stays open
+KEEPALIVE = int(os.environ.get("IL2_PASSPORT_KEEPALIVE", "30"))
+# Seconds shutdown() waits for requests in flight
+SHUTDOWN_GRACE = 5
+
+
+class RequestTracker:
+    """WSGI middleware counting the requests in flight, so shutdown can wait for them."""
+
+    def __init__(self, wsgi_app):
+        self.wsgi_app = wsgi_app
+        self.active = 0
+        self.closing = False
+        self._cond = threading.Condition()
+
+    def __call__(self, environ, start_response):
+        with self._cond:
+            if self.closing:
+                return Response("Shutting down", status=503)(environ, start_response)
+            self.active += 1
+        try:
+            body = self.wsgi_app(environ, start_response)
+        except BaseException:
+            self._done()
+            raise
+        # Streamed responses count until the server has sent (and closed) the body
+        return ClosingIterator(body, self._done)
+
+    def _done(self):
+        with self._cond:
+            self.active -= 1
+            self._cond.notify_all()
+
+    def drain(self, timeout):
+        """Turn new requests away and wait for the running ones; False on timeout."""
+        with self._cond:
+            self.closing = True
+            return self._cond.wait_for(lambda: self.active == 0, timeout)
+
+
+_tracker = [None]
+_server = [None]
+_shutdown_lock = threading.Lock()
+
+
+def serve(app, host=HOST, port=PORT):
+    """Run app until shutdown(), on waitress or the development server per SERVER_MODE."""
+    tracker = _tracker[0] = RequestTracker(app.wsgi_app)
+    app.wsgi_app = tracker
+    mode = SERVER_MODE
+    if mode == "waitress" and waitress is None:
+        print("IL2_PASSPORT_SERVER=waitress but waitress is not installed; using the development server")
+        mode = "dev"
+
+    if mode == "waitress":
+        # Every open /api/events stream holds a thread; those get threads of their own
+        threads = THREADS + events.MAX_STREAMS
+        server = _server[0] = waitress.create_server(
+            app, host=host, port=port, threads=threads, channel_timeout=KEEPALIVE,
+            ident="IL-2 Pilot Passport"
+        )
+        print(f"Serving on http://{host}:{port} (waitress, {THREADS} threads + {events.MAX_STREAMS} for event streams)")
+        server.run()
+    else:
+        app.run(host=host, port=port, debug=False, threaded=True)
+
+
+def shutdown(reason):
+    """Stop taking requests, let the running ones finish, release cp.db and exit."""
+    if not _shutdown_lock.acquire(blocking=False):
+        return  # already on its way out
+    print(f"{reason} Shutting down.")
+    # Event streams never finish on their own
+    events.broker.close()
+    tracker = _tracker[0]
+    if tracker is not None and not tracker.drain(SHUTDOWN_GRACE):
+        print(f"{tracker.active} request(s) still running after {SHUTDOWN_GRACE}s; exiting anyway.")
+    server = _server[0]
+    if server is not None:
+        server.task_dispatcher.shutdown(cancel_pending=True, timeout=1)
+    db.close_all_pools()
+    # Neither server can be stopped from another thread without this
+    os._exit(0)
+
+
+def shutdown_in_background(reason):
+    """shutdown() from a request handler: the response goes out before the process exits."""
+    threading.Thread(target=shutdown, args=(reason,), name="shutdown", daemon=True).start()
@@ -0,0 +1,126 @@
+import os
+import sqlite3
+import threading
+import time
+from collections import namedtuple
+from urllib.request import pathname2url
+import db
+import pilot_index
+from snapshot import snapshot_prefix, remove_generations
+
+ALIAS = "aux"
+
+# Lookup tables for cp.db, read in place; the game's file itself is never touched.
+# A chain is identified by the id of its tip career.
+SCHEMA = """
+CREATE TABLE pilot_chain (pilot_id INTEGER PRIMARY KEY, chain_id INTEGER);
+CREATE INDEX pilot_chain_chain ON pilot_chain (chain_id);
+CREATE TABLE chain_event (
+    chain_id INTEGER, type INTEGER, date TEXT, event_rowid INTEGER,
+    PRIMARY KEY (chain_id, type, date, event_rowid)
+) WITHOUT ROWID;
+CREATE TABLE chain_sortie (
+    chain_id INTEGER, date TEXT, sortie_rowid INTEGER,
+    PRIMARY KEY (chain_id, date, sortie_rowid)
+) WITHOUT ROWID;
+"""
+
+# version is the database_version() the tables were built for
+Sidecar = namedtuple("Sidecar", "source path version")
+
+_current = {}
+_lock = threading.Lock()
+_locks = {}
+
+
+def _source_lock(db_path):
+    # One build per database at a time; like SnapshotStore._source_lock
+    with _lock:
+        return _locks.setdefault(db_path, threading.Lock())
+
+
+def _uri(path):
+    return "file:" + pathname2url(os.path.abspath(path)) + "?mode=ro"
+
+
+def build_sidecar(conn, db_path, target):
+    index = pilot_index.get_pilot_index(conn, db_path)
+    graph = index.graph
+    tmp_path = target + ".tmp"
+    if os.path.exists(tmp_path):
+        os.remove(tmp_path)
+    out = sqlite3.connect(tmp_path, uri=True)
+    try:
+        out.execute("PRAGMA journal_mode = OFF")
+        out.executescript(SCHEMA)
+        # First career wins for a pilot, like CareerGraph.career_of_player
+        out.executemany(
+            "INSERT OR IGNORE INTO pilot_chain VALUES (?, ?)",
+            ((pilot_id, graph.tip_of(cid)) for cid, pilot_id in graph.player_of.items())
+        )
+        out.execute("ATTACH DATABASE ? AS src", (_uri(db_path),))
+        out.execute("""
+            INSERT INTO chain_event
+            SELECT pc.chain_id, e.type, e.date, e.rowid
+            FROM src.event e JOIN pilot_chain pc ON pc.pilot_id = e.pilotId
+        """)
+        out.execute("""
+            INSERT INTO chain_sortie
+            SELECT pc.chain_id, s.date, s.rowid
+            FROM src.sortie s JOIN pilot_chain pc ON pc.pilot_id = s.pilotId
+        """)
+        out.commit()
+    finally:
+        out.close()
+    os.replace(tmp_path, target)
+
+
+def refresh(db_path, folder):
+    """Rebuild the sidecar of db_path unless it already matches the current data."""
+    with _source_lock(db_path):
+        return _refresh(db_path, folder)
+
+
+def _refresh(db_path, folder):
+    version = db.database_version(db_path)
+    current = _current.get(db_path)
+    if current is not None and current.version == version:
+        return False
+    started = time.time()
+    os.makedirs(folder, exist_ok=True)
+    prefix = snapshot_prefix(folder, db_path)
+    path = f"{prefix}{time.time_ns()}.db"
+    pool = db.get_pool(db_path)
+    conn = pool.acquire()
+    try:
+        build_sidecar(conn, db_path, path)
+    finally:
+        pool.release(conn)
+    with _lock:
+        _current[db_path] = Sidecar(db_path, path, version)
+    # Connections that still have an older one attached drop it on their next attach()
+    remove_generations(prefix, path)
+    print(f"cp.db sidecar built in {(time.time() - started) * 1000:.0f} ms: {path}")
+    return True
+
+
+def discard(db_path):
+    with _lock:
+        _current.pop(db_path, None)
+
+
+def attach(conn, db_path):
+    """Attach the sidecar of db_path to conn as ALIAS if it matches the data this
+    request reads; False (and the plain queries should be used) otherwise."""
+    current = _current.get(db_path)
+    attached = {row[1]: row[2] for row in conn.execute("PRAGMA database_list")}
+    if current is None or current.version != db.database_version(db_path):
+        if ALIAS in attached:
+            conn.execute(f"DETACH DATABASE {ALIAS}")
+        return False
+    if attached.get(ALIAS) == os.path.abspath(current.path):
+        return True
+    if ALIAS in attached:
+        conn.execute(f"DETACH DATABASE {ALIAS}")
+    conn.execute(f"ATTACH DATABASE ? AS {ALIAS}", (_uri(current.path) + "&immutable=1",))
+    return True
@@ -0,0 +1,139 @@
+import os
+import glob
+import hashlib
+import sqlite3
+import threading
+import time
+from collections import namedtuple
+import db
+
+# Indexes the game's cp.db lacks, added to every copy for the app's own queries
+COVERING_INDEXES = [
+    ("passport_event_pilot_type_date", "event", ("pilotId", "type", "date")),
+    ("passport_sortie_pilot_date", "sortie", ("pilotId", "date")),
+    ("passport_career_extends", "career", ("extends",)),
+    ("passport_pilot_description", "pilot", ("description",)),
+]
+
+# Rollback-journal copies go this many pages at a time, pausing between steps
+BACKUP_PAGES = 1024
+BACKUP_PAUSE = 0.01
+
+# version is the live_version() of cp.db at the moment it was copied
+Snapshot = namedtuple("Snapshot", "source path version")
+
+
+def snapshot_prefix(folder, source):
+    key = hashlib.sha1(os.path.abspath(source).encode("utf-8")).hexdigest()[:12]
+    return os.path.join(folder, f"cp-{key}-")
+
+
+def remove_generations(prefix, keep=None):
+    """Delete files starting with prefix except keep; files still open are left for later.
+
+    .tmp files are copies still being written and are left alone.
+    """
+    for path in glob.glob(prefix + "*"):
+        if path == keep or path.endswith(".tmp"):
+            continue
+        try:
+            os.remove(path)
+        except OSError:
+            pass  # still open by a request (Windows); retried after the next generation
+
+
+def copy_database(source, target):
+    """Copy source into target with the online backup API and add COVERING_INDEXES."""
+    tmp_path = target + ".tmp"
+    if os.path.exists(tmp_path):
+        os.remove(tmp_path)
+    src = db.open_readonly(source)
+    dst = sqlite3.connect(tmp_path)
+    try:
+        if src.execute("PRAGMA journal_mode").fetchone()[0].lower() == "wal":
+            # Readers never block a WAL writer, so one step gives a consistent copy
+            src.backup(dst)
+        else:
+            # With a rollback journal our shared lock blocks the game's commits:
+            # copy in short steps and let it write in between (a write restarts the copy)
+            src.backup(dst, pages=BACKUP_PAGES, sleep=BACKUP_PAUSE)
+        dst.execute("PRAGMA journal_mode = OFF")
+        for name, table, columns in COVERING_INDEXES:
+            present = {row[1] for row in dst.execute(f"PRAGMA table_info({table})")}
+            if all(c in present for c in columns):
+                dst.execute(f'CREATE INDEX IF NOT EXISTS {name} ON {table} ({", ".join(columns)})')
+        dst.commit()
+    finally:
+        dst.close()
+        src.close()
+    os.replace(tmp_path, target)
+
+
+class SnapshotStore:
+    """Read-only copies of cp.db in the config directory, one generation at a time.
+
+    Every generation is a new file that is never written again, so requests
+    can keep reading the old one while the next is copied; old files are
+    removed once nothing holds them open any more.
+    """
+
+    def __init__(self, folder):
+        self.folder = folder
+        self._current = {}
+        self._locks = {}
+        self._lock = threading.Lock()
+        os.makedirs(folder, exist_ok=True)
+
+    def _source_lock(self, source):
+        with self._lock:
+            return self._locks.setdefault(source, threading.Lock())
+
+    def current(self, source):
+        """The snapshot reads of source are served from, copying it on first use."""
+        snapshot = self._current.get(source)
+        if snapshot is not None:
+            return snapshot
+        with self._source_lock(source):
+            snapshot = self._current.get(source)
+            if snapshot is None:
+                snapshot = self._take(source)
+        return snapshot
+
+    def refresh(self, source):
+        """Copy source again if it changed since the current snapshot; True if it did."""
+        with self._source_lock(source):
+            snapshot = self._current.get(source)
+            if snapshot is not None and snapshot.version == db.live_version(source):
+                return False
+            self._take(source)
+        return True
+
+    def discard(self, source):
+        with self._lock:
+            lock = self._locks.pop(source, None)
+        if lock is None:
+            return None  # never snapshotted
+        with lock:
+            snapshot = self._current.pop(source, None)
+        if snapshot is not None:
+            db.close_pool(snapshot.path, retire=True)
+            self._remove_stale(source)
+        return snapshot
+
+    def _take(self, source):
+        started = time.time()
+        # Read the version first: a write during the copy shows up as a change next round
+        version = db.live_version(source)
+        path = f"{snapshot_prefix(self.folder, source)}{time.time_ns()}.db"
+        copy_database(source, path)
+        previous = self._current.get(source)
+        snapshot = self._current[source] = Snapshot(source, path, version)
+        print(f"cp.db snapshot taken in {(time.time() - started) * 1000:.0f} ms: {path}")
+        if previous is not None:
+            db.close_pool(previous.path, retire=True)
+        self._remove_stale(source)
+        return snapshot
+
+    def _remove_stale(self, source):
+        current = self._current.get(source)
+        remove_generations(snapshot_prefix(self.folder, source), current.path if current else None)
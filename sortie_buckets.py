@@ -0,0 +1,40 @@
+from collections import OrderedDict
+
+# Logbook kill buckets, in the column order of the logbook table.
+KILL_BUCKETS = OrderedDict([
+    ("air_kills", ["killLightPlane", "killMediumPlane", "killHeavyPlane"]),
+    ("ground_kills", [
+        'killHeavyTank', 'killMediumTank', 'killVehicle', 'killLightTank', 'killArmouredVehicle',
+        'killTruck', 'killCar'
+    ]),
+    ("naval_kills", ['killLightShip', 'killDestroyerShip', 'killSubmarine', 'killLargeCargoShip']),
+    ("artillery_kills", [
+        'killHowitzer', 'killFieldGun', 'killNavalGun', 'killRocketLauncher',
+        'killHeavyFlak', 'killLightFlak', 'killAAAMachineGun'
+    ]),
+    ("railway_kills", ['killTrainLocomotive', 'killTrainVagon']),
+    ("structure_kills", [
+        'killRuralYard', 'killTownBuilding', 'killFactoryBuilding',
+        'killRailwayStationFacility', 'killBridge', 'killAirfieldFacility'
+    ]),
+])
+
+
+def bucket_expressions(columns, alias="s"):
+    """[(bucket, SQL expression)] adding up the bucket's columns that exist in this schema."""
+    present = set(columns)
+    expressions = []
+    for bucket, bucket_columns in KILL_BUCKETS.items():
+        terms = [f"IFNULL({alias}.{c}, 0)" for c in bucket_columns if c in present]
+        expressions.append((bucket, " + ".join(terms) if terms else "0"))
+    return expressions
+
+
+def bucket_select(columns, alias="s"):
+    """Per-row bucket totals, for a SELECT list."""
+    return [f"{expr} AS {bucket}" for bucket, expr in bucket_expressions(columns, alias)]
+
+
+def bucket_sum_select(columns, alias="s"):
+    """Bucket totals over a group, for a SELECT list with GROUP BY."""
+    return [f"SUM({expr}) AS {bucket}" for bucket, expr in bucket_expressions(columns, alias)]
@@ -0,0 +1,116 @@
+import os
+import hashlib
+import threading
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from flask import current_app, request
+import db
+import metrics
+
+# The game's own cp.db; archives get ids derived from their path
+LIVE = "live"
+LIVE_LABEL = "Game"
+SOURCE_WORKERS = 4
+
+Source = namedtuple("Source", "id label path")
+
+
+def source_id(path):
+    return "db-" + hashlib.sha1(os.path.abspath(path).encode("utf-8")).hexdigest()[:8]
+
+
+def pilot_key(source, desc):
+    """Roster key of a pilot across sources; the same description can live in several."""
+    return f"{source}:{desc}"
+
+
+def archive_sources(entries, live_path=None):
+    """A Source per configured archive database (a path or {"path", "label"}) that exists."""
+    archives = []
+    seen = {os.path.abspath(live_path)} if live_path else set()
+    for entry in entries:
+        if isinstance(entry, dict):
+            path, label = entry.get("path"), entry.get("label")
+        else:
+            path, label = entry, None
+        if not path or not os.path.isfile(path):
+            print(f"Archive database not found, skipped: {path}")
+            continue
+        path = os.path.abspath(path)
+        if path in seen:
+            continue
+        seen.add(path)
+        label = label or os.path.basename(os.path.dirname(path)) or path
+        archives.append(Source(source_id(path), label, path))
+    return archives
+
+
+def configured_sources(config):
+    """The game's cp.db (when found) followed by the archives whose file is there, from an app config."""
+    found = []
+    live_path = config.get("DB_PATH")
+    if live_path and os.path.isfile(live_path):
+        found.append(Source(LIVE, LIVE_LABEL, live_path))
+    found += [s for s in config.get("ARCHIVE_SOURCES") or [] if os.path.isfile(s.path)]
+    return found
+
+
+def multi_source(config):
+    return bool(config.get("ARCHIVE_SOURCES"))
+
+
+def source_path(config, source):
+    """cp.db of a source id; the game's for LIVE or no id, None for an unknown id."""
+    if not source or source == LIVE:
+        return config.get("DB_PATH")
+    for archive in config.get("ARCHIVE_SOURCES") or []:
+        if archive.id == source:
+            return archive.path
+    return None
+
+
+def request_db_paths(all_sources=False):
+    """The databases the current request reads: its ?source= (the game's by default),
+    or with all_sources every source, as the merged /api/pilots does."""
+    if all_sources:
+        return [s.path for s in configured_sources(current_app.config)]
+    path = source_path(current_app.config, request.args.get("source"))
+    return [path] if path else []
+
+
+_executor = ThreadPoolExecutor(max_workers=SOURCE_WORKERS, thread_name_prefix="sources")
+
+
+def map_sources(fn, sources):
+    """[fn(source)] in order, run on the shared pool; SQL is counted for the caller."""
+    if len(sources) <= 1:
+        return [fn(source) for source in sources]
+    return list(_executor.map(metrics.carry_tally(fn), sources))
+
+
+class RosterCache:
+    """Roster of each source, rebuilt only when that source's database changes."""
+
+    def __init__(self):
+        self._entries = {}
+        self._lock = threading.Lock()
+
+    def get(self, db_path, locale, names, build):
+        """build() unless the cached roster is for this database version and catalog."""
+        version = db.database_version(db_path)
+        with self._lock:
+            cached = self._entries.get((db_path, locale))
+        if cached and cached[0] == version and cached[1] is names:
+            return cached[2]
+        value = build()
+        with self._lock:
+            self._entries[(db_path, locale)] = (version, names, value)
+        return value
+
+    def forget(self, db_path):
+        with self._lock:
+            for entry in [k for k in self._entries if k[0] == db_path]:
+                del self._entries[entry]
+
+
+rosters = RosterCache()
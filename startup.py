@@ -0,0 +1,115 @@
+import threading
+import time
+import traceback
+
+
+class StartupState:
+    """Progress of the background startup work, reported by /api/startup.
+
+    Ready from the start unless run_in_background() is used. When the app is
+    imported instead (WSGI servers), run_once() does the work on the first
+    request, as the import itself used to.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.ready = True
+        self.stage = "ready"
+        self.message = ""
+        self.error = None
+        self.started = None
+        self.finished = None
+        self.steps = []  # [stage, message, seconds or None while running]
+
+    def begin(self):
+        with self._lock:
+            self.ready = False
+            self.stage = "starting"
+            self.message = "Starting"
+            self.error = None
+            self.started = time.time()
+            self.finished = None
+            self.steps = []
+
+    def step(self, stage, message):
+        with self._lock:
+            self._close_step()
+            self.stage = stage
+            self.message = message
+            self.steps.append([stage, message, None, time.time()])
+
+    def finish(self, error=None):
+        with self._lock:
+            self._close_step()
+            self.ready = True
+            self.stage = "failed" if error else "ready"
+            self.message = error or "Ready"
+            self.error = error
+            self.finished = time.time()
+
+    def _close_step(self):
+        if self.steps and self.steps[-1][2] is None:
+            self.steps[-1][2] = time.time() - self.steps[-1][3]
+
+    def status(self):
+        with self._lock:
+            elapsed = None
+            if self.started is not None:
+                elapsed = (self.finished or time.time()) - self.started
+            return {
+                "ready": self.ready,
+                "stage": self.stage,
+                "message": self.message,
+                "error": self.error,
+                "elapsed": elapsed,
+                "steps": [
+                    {"stage": stage, "message": message, "seconds": seconds}
+                    for stage, message, seconds, _ in self.steps
+                ],
+            }
+
+
+state = StartupState()
+
+
+def is_ready():
+    return state.ready
+
+
+def _run_steps(steps):
+    for stage, message, fn in steps:
+        state.step(stage, message)
+        try:
+            fn()
+        except Exception as e:
+            # The app still starts; the user can point it at the game from the UI
+            traceback.print_exc()
+            state.finish(error=f"{message} failed: {e}")
+            return
+    state.finish()
+    print(f"Startup finished in {state.status()['elapsed']:.2f}s")
+
+
+_run_once_lock = threading.Lock()
+
+
+def run_once(steps):
+    """Run [(stage, message, fn)] inline unless startup work already began (or ran)."""
+    if state.started is not None:
+        return
+    with _run_once_lock:
+        if state.started is None:
+            state.begin()
+            _run_steps(steps)
+
+
+def run_in_background(steps):
+    """Run [(stage, message, fn)] one after another on a worker thread."""
+    state.begin()
+
+    def worker():
+        _run_steps(steps)
+
+    thread = threading.Thread(target=worker, name="startup", daemon=True)
+    thread.start()
+    return thread
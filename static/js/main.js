@@ -1,4 +1,7 @@
 let cropper, pilotMap = {}, currentDesc = "";
+// With archive databases the same pilot can be listed once per source:
+// currentKey is the selected option, currentSource its database ("" = the game's)
+let currentKey = "", currentSource = "";
 
 // ----------- Game Path Modal Logic -----------
 const gamePathModal = document.getElementById('gamePathModal');
@@ -95,13 +98,7 @@ function fetchPilots() {
 
       // Success: keep the path, populate list
       hideGamePathModal();
-      sel.innerHTML = "";
-      pilotMap = {};
-      data.forEach((p, i) => {
-        const label = `${p.display || "Unknown"} - ${p.country || ""} - ${p.squadron || ""}`;
-        sel.innerHTML += `<option value="${encodeURIComponent(p.desc)}">${label}</option>`;
-        pilotMap[encodeURIComponent(p.desc)] = p.desc;
-      });
+      fillPilotSelect(data);
       sel.selectedIndex = 0;
       loadPilot();
       showPage(0);
@@ -115,6 +112,18 @@ function fetchPilots() {
     });
 }
 
+function fillPilotSelect(pilots) {
+  const sel = document.getElementById('pilot-select');
+  sel.innerHTML = "";
+  pilotMap = {};
+  pilots.forEach(p => {
+    let label = `${p.display || "Unknown"} - ${p.country || ""} - ${p.squadron || ""}`;
+    if (p.source_label) label += ` [${p.source_label}]`;
+    const value = encodeURIComponent(p.key || p.desc);
+    sel.innerHTML += `<option value="${value}">${label}</option>`;
+    pilotMap[value] = { desc: p.desc, source: p.source || "" };
+  });
+}
 
 function clearPassportUI() {
   // Set all fields to empty or placeholder image
@@ -131,16 +140,39 @@ function clearPassportUI() {
   document.getElementById('stats-table').innerHTML = '';
 }
 
-// Only fetch once (no duplicate /service_record fetch)
+// Record, stats and the first logbook page of the selected pilot, from one
+// /api/pilot_dossier round trip; the stats and logbook pages read from here.
+let currentDossier = null;
+
+function dossierFor(desc) {
+  return (currentDossier && currentDossier.key === currentKey && currentDossier.desc === desc)
+    ? currentDossier.data : null;
+}
+
+// desc= plus the source= of the selected pilot, for the per-pilot endpoints
+function pilotQuery(desc) {
+  let query = 'desc=' + encodeURIComponent(desc);
+  if (currentSource) query += '&source=' + encodeURIComponent(currentSource);
+  return query;
+}
+
 function loadPilot() {
   let sel = document.getElementById('pilot-select');
-  let desc_encoded = sel.value;
-  let desc = pilotMap[desc_encoded];
-  currentDesc = desc;
+  const key = sel.value;
+  const pilot = pilotMap[key];
+  currentKey = key;
+  currentDesc = pilot ? pilot.desc : "";
+  currentSource = pilot ? pilot.source : "";
+  currentDossier = null;
+  const desc = currentDesc;
   if (!desc) { clearPassportUI(); return; }
-  fetch('/api/service_record?desc=' + encodeURIComponent(desc))
+  fetch('/api/pilot_dossier?' + pilotQuery(desc) + '&limit=' + LOGBOOK_PAGE_SIZE)
     .then(r => r.json())
-    .then(updatePassport)
+    .then(data => {
+      if (key !== currentKey) return;  // pilot changed while we were loading
+      if (data && !data.error) currentDossier = { key: key, desc: desc, data: data };
+      updatePassport(data && data.record);
+    })
     .catch(()=>clearPassportUI());
   // Reset UI to record page
   serviceRecord.style.display = "";
@@ -160,7 +192,7 @@ function updatePassport(data) {
   document.getElementById('pilot-sq').textContent = info.squadron || '';
   document.getElementById('pilot-rank').textContent = info.rank_name || '';
   // Show photo (with fallback)
-  document.getElementById('pilot-photo').src = (info.photo_url ? (info.photo_url + "?t=" + Date.now()) : "static/images/sample_photo.jpg");
+  document.getElementById('pilot-photo').src = (info.photo_url || "static/images/sample_photo.jpg");
 
   // Promotions
   let promolist = document.getElementById('promotion-list');
@@ -175,7 +207,7 @@ function updatePassport(data) {
   let awardlist = document.getElementById('award-list');
   awardlist.innerHTML = '';
   (data.awards || []).forEach(a => {
-    let imgPath = `/static/achievements/${a.tpar2}/preview.png`;
+    let imgPath = a.img || `/static/achievements/${a.tpar2}/preview.png`;
     awardlist.innerHTML += `<li>
         <img src="${imgPath}" alt="Medal" class="award-icon" onerror="this.src='static/images/award_placeholder.png'">
         <span>${a.desc}</span>
@@ -235,7 +267,10 @@ function doCrop() {
     .then(r => r.json())
     .then(data => {
       if(data.path) {
-        document.getElementById('pilot-photo').src = data.path + "?t=" + Date.now();
+        // Content-hashed name: a new upload is a new URL, no cache busting needed
+        document.getElementById('pilot-photo').src = data.path;
+      } else if (data.error) {
+        alert(data.error);
       }
       cancelCrop();
     });
@@ -272,12 +307,20 @@ arrowPrev.onclick = () => showPage(currentPage - 1);
 
 function loadStats(desc) {
   if (!desc) return;
-  fetch('/api/pilot_stats?desc=' + encodeURIComponent(desc))
+  const dossier = dossierFor(desc);
+  if (dossier && dossier.stats) {
+    renderStats(dossier.stats);
+    return;
+  }
+  fetch('/api/pilot_stats?' + pilotQuery(desc))
     .then(r => r.json())
-    .then(data => {
-      const tbl = document.getElementById('stats-table');
-      tbl.innerHTML = '';
-      Object.entries(data).forEach(([k, value]) => {
+    .then(renderStats);
+}
+
+function renderStats(data) {
+  const tbl = document.getElementById('stats-table');
+  tbl.innerHTML = '';
+  Object.entries(data).forEach(([k, value]) => {
 		  let display = value;
 		  if (k.toLowerCase().includes('flight time') && typeof value === 'number') {
 			const seconds = value;
@@ -288,29 +331,16 @@ function loadStats(desc) {
 		  const tbl = document.getElementById('stats-table');
 		  tbl.innerHTML += `<div class="stats-row"><span class="stats-label">${k}:</span><span class="stats-value">${display}</span></div>`;
 		});
-    });
 }
 
 function formatSingleKill(value) {
   return value ? value : "";
 }
 
-function loadLogbook(desc) {
-  if (!desc) return;
-  fetch('/api/pilot_sorties?desc=' + encodeURIComponent(desc))
-    .then(r => {
-      if (!r.ok) throw new Error(`HTTP ${r.status}`);
-      return r.json();
-    })
-    .then(data => {
-      const tableDiv = document.getElementById('logbook-table');
-      if (!Array.isArray(data) || data.length === 0) {
-        tableDiv.innerHTML = "<div style='margin-top:30px;'>No sorties found for this pilot.</div>";
-        return;
-      }
+const LOGBOOK_PAGE_SIZE = 200;
 
-      // Build HTML table with stacked headers and separate kill columns
-        let html = `
+function logbookHeaderHtml() {
+  return `
       <table class="logbook-table">
         <thead>
           <tr>
@@ -356,9 +386,10 @@ function loadLogbook(desc) {
         </thead>
         <tbody>
     `;
+}
 
-     data.forEach(sortie => {
-       html += `
+function logbookRowHtml(sortie) {
+  return `
         <tr>
           <td>${sortie.date || ''}</td>
           <td>${sortie.aircraft || ''}</td>
@@ -372,15 +403,51 @@ function loadLogbook(desc) {
           <td>${sortie.flight_time || ''}</td>
         </tr>
       `;
-     });
+}
 
-      html += "</tbody></table>";
-      tableDiv.innerHTML = html;
-    })
-    .catch(e => {
-      console.error("loadLogbook error:", e);
-      document.getElementById('logbook-table').innerHTML = "Failed to load logbook.";
-    });
+// Render the first page as soon as it arrives, then keep appending pages
+// until the server stops handing out a next_cursor.
+function loadLogbook(desc) {
+  if (!desc) return;
+  const key = currentKey;
+  const tableDiv = document.getElementById('logbook-table');
+
+  function fetchPage(cursor) {
+    let url = '/api/pilot_sorties?' + pilotQuery(desc) + '&limit=' + LOGBOOK_PAGE_SIZE;
+    if (cursor) url += '&cursor=' + encodeURIComponent(cursor);
+    return fetch(url)
+      .then(r => {
+        if (!r.ok) throw new Error(`HTTP ${r.status}`);
+        return r.json();
+      })
+      .then(data => renderPage(data, cursor));
+  }
+
+  function renderPage(data, cursor) {
+    if (key !== currentKey) return;  // pilot changed while we were loading
+    const sorties = (data && Array.isArray(data.sorties)) ? data.sorties : [];
+    const rows = sorties.map(logbookRowHtml).join('');
+    if (!cursor) {
+      if (sorties.length === 0) {
+        tableDiv.innerHTML = "<div style='margin-top:30px;'>No sorties found for this pilot.</div>";
+        return;
+      }
+      tableDiv.innerHTML = logbookHeaderHtml() + rows + "</tbody></table>";
+    } else {
+      tableDiv.querySelector('tbody').insertAdjacentHTML('beforeend', rows);
+    }
+    if (data.next_cursor) return fetchPage(data.next_cursor);
+  }
+
+  // The dossier already carries the first page
+  const dossier = dossierFor(desc);
+  const first = (dossier && dossier.sorties)
+    ? Promise.resolve().then(() => renderPage(dossier.sorties, null))
+    : fetchPage(null);
+  first.catch(e => {
+    console.error("loadLogbook error:", e);
+    tableDiv.innerHTML = "Failed to load logbook.";
+  });
 }
 
 function humanizeMissionType(raw) {
@@ -403,7 +470,35 @@ function formatFlightTime(seconds) {
 
 
 
+// ----------- Startup -----------
+// The server answers at once and locates the game / indexes cp.db in the
+// background; show its progress in the pilot selector until it is ready.
+const STARTUP_POLL_MS = 250;
+
+function waitForStartup() {
+  const sel = document.getElementById('pilot-select');
+  return fetch('/api/startup')
+    .then(r => r.json())
+    .then(status => {
+      if (status.ready) return status;
+      sel.innerHTML = `<option>${status.message || "Starting"}...</option>`;
+      return new Promise(resolve => setTimeout(resolve, STARTUP_POLL_MS)).then(waitForStartup);
+    });
+}
+
 window.addEventListener('DOMContentLoaded', function() {
+  waitForStartup()
+    .then(status => {
+      if (status.error) console.warn("Startup finished with an error:", status.error);
+      startApp();
+    })
+    .catch(e => {
+      console.error("Startup status unavailable:", e);
+      startApp();
+    });
+});
+
+function startApp() {
     const lastPath = localStorage.getItem('il2GamePath');
     if (lastPath) {
         // Optimistically use existing path to load pilots without immediately nuking it if validation is flaky.
@@ -434,10 +529,61 @@ window.addEventListener('DOMContentLoaded', function() {
     } else {
         showGamePathModal(); // force user to supply path
     }
-});
+}
+
+
+// ----------- Live updates -----------
+// The open /api/events stream keeps the server alive (no more pings) and tells
+// us whose career data changed after a mission, so only those panels reload.
+function refreshPilotList() {
+  fetch("/api/pilots")
+    .then(r => r.json())
+    .then(data => {
+      if (!Array.isArray(data) || data.length === 0) return;
+      const selected = currentKey;
+      fillPilotSelect(data);
+      if (selected && pilotMap[selected] !== undefined) {
+        document.getElementById('pilot-select').value = selected;
+      } else {
+        document.getElementById('pilot-select').selectedIndex = 0;
+        loadPilot();
+        showPage(0);
+      }
+    });
+}
 
+function refreshCurrentPilot() {
+  const desc = currentDesc, key = currentKey;
+  if (!desc) return;
+  // The passport is always on screen; stats and logbook only when open
+  let sections = "record";
+  if (currentPage === 1) sections += ",stats";
+  if (currentPage === 2) sections += ",sorties";
+  fetch('/api/pilot_dossier?' + pilotQuery(desc) + '&sections=' + sections + '&limit=' + LOGBOOK_PAGE_SIZE)
+    .then(r => r.json())
+    .then(data => {
+      if (key !== currentKey || !data || data.error) return;
+      currentDossier = { key: key, desc: desc, data: data };
+      updatePassport(data.record);
+      if (currentPage === 1) renderStats(data.stats);
+      if (currentPage === 2) loadLogbook(desc);
+    });
+}
 
+const EVENTS_RETRY_MS = 30000;
 
-setInterval(() => {
-    fetch('/api/ping', {method: 'POST'});
-}, 5000); // Sends a ping every 5 seconds
\ No newline at end of file
+function listenForChanges() {
+  const source = new EventSource('/api/events');
+  // A refused stream (503: too many open) is not retried by the browser itself
+  source.addEventListener('error', () => {
+    if (source.readyState === EventSource.CLOSED) setTimeout(listenForChanges, EVENTS_RETRY_MS);
+  });
+  source.addEventListener('career', e => {
+    const change = JSON.parse(e.data);
+    if (change.roster || change.all) refreshPilotList();
+    // Only the database the event came from; the game's own is "live"
+    if ((change.source || 'live') !== (currentSource || 'live')) return;
+    if (change.all || change.pilots.includes(currentDesc)) refreshCurrentPilot();
+  });
+}
+listenForChanges();
\ No newline at end of file
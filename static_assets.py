@@ -0,0 +1,184 @@
+import os
+import re
+import gzip
+import hashlib
+import mimetypes
+import posixpath
+import threading
+from collections import namedtuple
+from flask import Response, request, send_from_directory
+from asset_sync import file_hash, scan_tree
+
+try:
+    # Optional: without it only gzip variants are precomputed
+    import brotli
+except ImportError:
+    brotli = None
+
+# Front-end files that get content-hashed URLs; index.html links them by those
+FINGERPRINT_DIRS = ("css", "js", "images")
+# Text files whose references are rewritten and which get compressed variants
+TEXT_EXTENSIONS = {".css", ".js", ".html", ".svg", ".json"}
+# Bundled image trees without fingerprints: cached for a while, then revalidated
+BUNDLED_DIRS = ("images", "standard_charactersranks", "achievements", "squadrons")
+
+IMMUTABLE_MAX_AGE = 365 * 24 * 3600
+BUNDLED_MAX_AGE = 24 * 3600
+
+# "static/css/main.css" in HTML and JS, url('../images/x.png') in CSS
+# (matched as bytes: not every bundled file is UTF-8)
+STATIC_REF_RE = re.compile(rb"(?<=[\"'(])/?static/([\w./-]+)")
+CSS_URL_RE = re.compile(rb"url\((['\"]?)([^'\")]+)\1\)")
+
+# rel: path under static/; body: the (rewritten) text, or None to serve the file itself
+Asset = namedtuple("Asset", "rel url digest mimetype body variants")
+
+
+def fingerprinted_name(rel, digest):
+    base, ext = posixpath.splitext(rel)
+    return f"{base}.{digest[:10]}{ext}"
+
+
+def compress_variants(body):
+    """{encoding: bytes} for the encodings that actually make body smaller."""
+    variants = {}
+    packed = gzip.compress(body, compresslevel=9, mtime=0)
+    if len(packed) < len(body):
+        variants["gzip"] = packed
+    if brotli is not None:
+        packed = brotli.compress(body, quality=11)
+        if len(packed) < len(body):
+            variants["br"] = packed
+    return variants
+
+
+class AssetManifest:
+    """Content-hashed URLs for the front-end files, plus index.html rewritten to use them."""
+
+    def __init__(self, STATIC_ROOT, files):
+        self.root = STATIC_ROOT
+        self.files = files
+        self.urls = {}  # rel -> /static/<fingerprinted rel>
+        self.assets = {}  # fingerprinted rel -> Asset
+
+        # Binary files first, so the text files that reference them can be rewritten
+        text = []
+        for rel in sorted(files):
+            if posixpath.splitext(rel)[1] in TEXT_EXTENSIONS:
+                text.append(rel)
+            else:
+                self._add(rel, file_hash(self._path(rel)), None)
+        for rel in text:
+            with open(self._path(rel), "rb") as f:
+                body = self.rewrite(rel, f.read())
+            self._add(rel, hashlib.sha1(body).hexdigest(), body)
+
+        with open(self._path("index.html"), "rb") as f:
+            body = self.rewrite("index.html", f.read())
+        self.index = Asset("index.html", "/", hashlib.sha1(body).hexdigest(),
+                           "text/html", body, compress_variants(body))
+
+    def _path(self, rel):
+        return os.path.join(self.root, *rel.split("/"))
+
+    def _add(self, rel, digest, body):
+        name = fingerprinted_name(rel, digest)
+        mimetype = mimetypes.guess_type(rel)[0] or "application/octet-stream"
+        variants = compress_variants(body) if body is not None else {}
+        self.assets[name] = Asset(rel, f"/static/{name}", digest, mimetype, body, variants)
+        self.urls[rel] = f"/static/{name}"
+
+    def rewrite(self, rel, body):
+        """Point references to fingerprinted files at their hashed URLs."""
+        def static_ref(m):
+            url = self.urls.get(m.group(1).decode("ascii"))
+            return url.encode("ascii") if url else m.group(0)
+
+        body = STATIC_REF_RE.sub(static_ref, body)
+        if rel.endswith(".css"):
+            base = posixpath.dirname(rel)
+
+            def css_url(m):
+                target = posixpath.normpath(posixpath.join(base, m.group(2).decode("latin-1")))
+                url = self.urls.get(target)
+                if not url:
+                    return m.group(0)
+                return b"url(" + m.group(1) + url.encode("ascii") + m.group(1) + b")"
+
+            body = CSS_URL_RE.sub(css_url, body)
+        return body
+
+
+def scan_assets(STATIC_ROOT):
+    """{rel: (size, mtime_ns)} of the fingerprinted files and index.html."""
+    files = {}
+    for folder in FINGERPRINT_DIRS:
+        path = os.path.join(STATIC_ROOT, folder)
+        if os.path.isdir(path):
+            for rel, stamp in scan_tree(path).items():
+                files[f"{folder}/{rel}"] = stamp
+    st = os.stat(os.path.join(STATIC_ROOT, "index.html"))
+    return files, (st.st_size, st.st_mtime_ns)
+
+
+# ---- Process-wide manifest; rebuilt when a file changes (not in frozen builds) ----
+_manifest = [None, None]  # [stamps, AssetManifest]
+_manifest_lock = threading.Lock()
+
+
+def get_manifest(STATIC_ROOT, frozen, rescan=True):
+    with _manifest_lock:
+        if _manifest[1] is not None and (frozen or not rescan):
+            return _manifest[1]
+        files, index_stamp = scan_assets(STATIC_ROOT)
+        stamps = (files, index_stamp)
+        if _manifest[0] != stamps:
+            _manifest[1] = AssetManifest(STATIC_ROOT, files)
+            _manifest[0] = stamps
+        return _manifest[1]
+
+
+# ---- Responses ----
+def _negotiate(asset):
+    for encoding in ("br", "gzip"):
+        if encoding in asset.variants and request.accept_encodings[encoding]:
+            return encoding, asset.variants[encoding]
+    return None, asset.body
+
+
+def _memory_response(asset, max_age):
+    encoding, body = _negotiate(asset)
+    response = Response(body, mimetype=asset.mimetype)
+    if encoding:
+        response.headers["Content-Encoding"] = encoding
+    if asset.variants:
+        response.vary.add("Accept-Encoding")
+    response.set_etag(f"{asset.digest[:20]}-{encoding or 'identity'}")
+    if max_age:
+        response.cache_control.public = True
+        response.cache_control.max_age = max_age
+    else:
+        response.cache_control.no_cache = True
+    return response.make_conditional(request)
+
+
+def index_response(STATIC_ROOT, frozen):
+    """index.html linking the fingerprinted files; revalidated on every load."""
+    return _memory_response(get_manifest(STATIC_ROOT, frozen).index, 0)
+
+
+def static_response(STATIC_ROOT, frozen, path):
+    manifest = get_manifest(STATIC_ROOT, frozen, rescan=False)
+    asset = manifest.assets.get(path)
+    if asset is not None:
+        # The name changes with the content, so it can be cached for good
+        if asset.body is not None:
+            response = _memory_response(asset, IMMUTABLE_MAX_AGE)
+        else:
+            response = send_from_directory(STATIC_ROOT, asset.rel, max_age=IMMUTABLE_MAX_AGE,
+                                           etag=asset.digest[:20])
+        response.cache_control.immutable = True
+        return response
+    if path.split("/", 1)[0] in BUNDLED_DIRS:
+        return send_from_directory(STATIC_ROOT, path, max_age=BUNDLED_MAX_AGE)
+    return send_from_directory(STATIC_ROOT, path)